@@ -1,24 +1,153 @@
-from flask import Flask, request, jsonify, send_file, render_template, redirect, url_for
+from flask import Flask, request, jsonify, send_file, render_template, redirect, url_for, Response, make_response, copy_current_request_context
 import requests
 import os
 import csv
 import math
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 from dotenv import load_dotenv
 import pandas as pd
 import io
+import re
+import unicodedata
 import json
+import threading
+import queue
+import time
+import functools
+import bisect
+import hashlib
+import zlib
+import fcntl
+import fnmatch
+import uuid
+import sys
+import hmac
+import cProfile
+import pstats
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from array import array
 
 app = Flask(__name__)
 load_dotenv()
 
-CLIENT_ID = os.getenv("CLIENT_ID")
-CLIENT_SECRET = os.getenv("CLIENT_SECRET")
-USERNAME = os.getenv("USERNAME")
-PASSWORD = os.getenv("PASSWORD")
-TOKEN_URL = os.getenv("TOKEN_URL")
+# Credentials for the default org: CLIENT_ID, CLIENT_SECRET, USERNAME, PASSWORD
+# and TOKEN_URL (read in load_lead_routing)
 LEAD_API_PATH = "/services/apexrest/lead/createlead"
 
+# Cached OAuth tokens are reused for this long before logging in again
+SF_TOKEN_TTL = int(os.getenv("SF_TOKEN_TTL", "3600"))
+SF_REQUEST_TIMEOUT = float(os.getenv("SF_REQUEST_TIMEOUT", "30"))
+
+# Salesforce API budget shared by this deployment, split evenly across workers
+WEB_CONCURRENCY = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+SF_API_RATE_PER_MINUTE = float(os.getenv("SF_API_RATE_PER_MINUTE", "100"))
+SF_API_BURST = float(os.getenv("SF_API_BURST", "20"))
+SOURCE_RATE_PER_MINUTE = float(os.getenv("SOURCE_RATE_PER_MINUTE", "60"))
+SOURCE_BURST = float(os.getenv("SOURCE_BURST", "10"))
+# Per-source overrides in requests per minute, e.g. "TikTok:30,Snapchat:20"
+SOURCE_RATE_OVERRIDES = os.getenv("SOURCE_RATE_OVERRIDES", "")
+
+# Request threads per worker (read by gunicorn.conf.py too). Long-lived
+# streams and queued admin requests each hold one, so their caps are sized to
+# always leave INGEST_RESERVED_THREADS free for /webhook.
+GUNICORN_THREADS = max(1, int(os.getenv("GUNICORN_THREADS", "16")))
+INGEST_RESERVED_THREADS = min(GUNICORN_THREADS - 1, int(os.getenv("INGEST_RESERVED_THREADS", "4")))
+# Open /api/stream connections per worker; a third of the unreserved threads by default
+LIVE_STREAM_LIMIT = int(os.getenv("LIVE_STREAM_LIMIT", str(max(1, (GUNICORN_THREADS - INGEST_RESERVED_THREADS) // 3))))
+
+# Leads over budget wait here until the buckets refill
+DEFERRED_LEADS_FILE = "deferred_leads.jsonl"
+
+# Which Salesforce orgs and dealer profiles each campaign/source is delivered to
+# (see lead_routing.example.json); without it everything goes to the org above
+LEAD_ROUTING_FILE = os.getenv("LEAD_ROUTING_FILE", "lead_routing.json")
+
+# Lead logs kept by this app, keyed by the short name used throughout
+LEAD_LOGS = {
+    "leads": "leads.csv",
+    "failed": "failed_leads.csv",
+    "google": "google_leads.csv"
+}
+
+# Columns of a new leads.csv; existing files keep whatever header they have
+LEADS_HEADER = [
+    "Timestamp", "Status", "Error", "Firstname", "Lastname", "Mobile", "Email",
+    "DealerCode", "Shrm_SvCtr", "Make", "Line", "Entry_Form", "Market",
+    "Campaign_Source", "Campaign_Name", "Campaign_Medium", "TestDriveType",
+    "Extended_Privacy", "Purchase_TimeFrame", "Source_Site",
+    "Marketing_Communication_Consent", "Fund", "FormCode", "Request_Origin",
+    "MasterKey", "Enquiry_Type"
+]
+
+# leads.csv columns named differently from the Salesforce field they hold
+LEADS_COLUMN_FIELDS = {"Purchase_TimeFrame": "Purchase_Time_Frame"}
+
+# Columns covered by the name/email/mobile search index for each log
+SEARCH_FIELDS = {
+    "leads": ["Firstname", "Lastname", "Email", "Mobile"],
+    "failed": ["Firstname", "Lastname", "Email", "Mobile"],
+    "google": ["FirstName", "LastName", "Email", "Phone"]
+}
+
+# Low-cardinality columns held as categoricals when a log is loaded; every
+# other column is read as text, so nothing is inferred and mobiles keep their
+# leading zero
+CATEGORICAL_COLUMNS = {
+    "leads": [
+        "Status", "Error", "DealerCode", "Shrm_SvCtr", "Make", "Line", "Entry_Form",
+        "Market", "Campaign_Source", "Campaign_Name", "Campaign_Medium", "TestDriveType",
+        "Extended_Privacy", "Purchase_TimeFrame", "Purchase_Time_Frame", "Source_Site",
+        "Marketing_Communication_Consent", "Fund", "FormCode", "Request_Origin",
+        "MasterKey", "Enquiry_Type"
+    ],
+    "failed": ["Error", "Status", "Campaign_Source", "Campaign_Name"],
+    "google": [
+        "CampaignID", "CampaignName", "AdGroupID", "AdGroupName",
+        "SentToSalesforce", "SalesforceStatus"
+    ]
+}
+LOG_CHUNK_ROWS = 100000
+
+def log_columns(log_name):
+    """Column names from a lead log's header line"""
+    with open(LEAD_LOGS[log_name], newline="", encoding="utf-8") as f:
+        return next(csv.reader(f), [])
+
+def load_log(log_name, columns=None, chunksize=None, raw=False):
+    """Read a lead log with its pinned schema.
+
+    columns limits the read to those columns (any this file doesn't have are
+    skipped); chunksize returns an iterator of DataFrames instead of one.
+    raw=True reads every cell as the exact text written, with '' for blanks,
+    for paths that modify the log and write it back.
+    """
+    header = log_columns(log_name)
+    usecols = [c for c in header if c in columns] if columns is not None else None
+    if raw:
+        dtype = str
+    else:
+        categorical = set(CATEGORICAL_COLUMNS[log_name])
+        dtype = {c: "category" if c in categorical else str for c in usecols or header}
+    return pd.read_csv(LEAD_LOGS[log_name], usecols=usecols, dtype=dtype,
+                       keep_default_na=not raw, chunksize=chunksize)
+
+def log_summary(log_name):
+    """(row count, last Timestamp) of a lead log, read in chunks of one column"""
+    if not os.path.exists(LEAD_LOGS[log_name]):
+        return 0, None
+    header = log_columns(log_name)
+    count = 0
+    last = None
+    # One column is enough to count rows; Timestamp when the log has one
+    columns = ["Timestamp"] if "Timestamp" in header else header[:1]
+    with load_log(log_name, columns=columns, chunksize=LOG_CHUNK_ROWS) as chunks:
+        for chunk in chunks:
+            count += len(chunk)
+            if len(chunk) and "Timestamp" in chunk.columns:
+                last = chunk["Timestamp"].iloc[-1]
+    return count, last
+
 def format_timestamp_for_display(timestamp):
     """Format timestamp into a user-friendly readable format"""
     try:
@@ -32,58 +161,473 @@ def format_timestamp_for_display(timestamp):
     except:
         return timestamp  # Return original if conversion fails
 
+# Arabic-Indic and Persian digits as sent by some Arabic keyboards
+ARABIC_DIGITS = str.maketrans("٠١٢٣٤٥٦٧٨٩۰۱۲۳۴۵۶۷۸۹", "01234567890123456789")
+
+# Spelling variants that shouldn't make two Arabic strings compare unequal
+ARABIC_FOLDING = str.maketrans({"أ": "ا", "إ": "ا", "آ": "ا", "ى": "ي", "ـ": None})
+ARABIC_DIACRITICS = re.compile("[\u064B-\u065F\u0670]")
+
+def normalize_text_key(value):
+    """Fold a free-text value for lookups: NFKC, Arabic spelling variants, digits, spacing and case"""
+    value = unicodedata.normalize("NFKC", str(value))
+    value = ARABIC_DIACRITICS.sub("", value).translate(ARABIC_FOLDING).translate(ARABIC_DIGITS)
+    return " ".join(value.split()).casefold()
+
+PURCHASE_TIMEFRAMES = {
+    "في أقرب وقت (أقل من شهر)": "Less than 1 month",
+    "1-3 أشهر": "1-3 months", 
+    "أكثر من 3 أشهر": "More than 3 months",
+    "Less than 1 month": "Less than 1 month",
+    "1-3 months": "1-3 months",
+    "More than 3 months": "More than 3 months"
+}
+PURCHASE_TIMEFRAME_LOOKUP = {normalize_text_key(k): v for k, v in PURCHASE_TIMEFRAMES.items()}
+
 def get_purchase_timeframe(value):
     """Map the purchase timeframe value to an accepted Salesforce value"""
-    mapping = {
-        "في أقرب وقت (أقل من شهر)": "Less than 1 month",
-        "1-3 أشهر": "1-3 months", 
-        "أكثر من 3 أشهر": "More than 3 months"
-    }
-    return mapping.get(value, "More than 3 months")  # Default value
-
-def get_salesforce_token():
-    """Obtain OAuth2 token from Salesforce"""
-    payload = {
-        "grant_type": "password",
-        "client_id": CLIENT_ID,
-        "client_secret": CLIENT_SECRET,
-        "username": USERNAME,
-        "password": PASSWORD
+    return PURCHASE_TIMEFRAME_LOOKUP.get(normalize_text_key(value), "More than 3 months")  # Default value
+
+def normalize_saudi_mobile(value):
+    """Return a Saudi mobile number as 05XXXXXXXX, or None if it isn't one"""
+    digits = re.sub(r"\D", "", unicodedata.normalize("NFKC", str(value)).translate(ARABIC_DIGITS))
+    for prefix in ("00966", "966", "0"):
+        if digits.startswith(prefix) and len(digits) == len(prefix) + 9:
+            digits = digits[len(prefix):]
+            break
+    if len(digits) == 9 and digits.startswith("5"):
+        return "0" + digits
+    return None
+
+EMAIL_PATTERN = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]{2,}$")
+
+def _clean_text(value, spec):
+    if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+        return None, f"must be text, got {type(value).__name__}"
+    value = " ".join(unicodedata.normalize("NFKC", str(value)).split())
+    max_length = spec.get("max_length")
+    if max_length and len(value) > max_length:
+        value = value[:max_length].rstrip()
+    return value, None
+
+def _clean_email(value, spec):
+    value, error = _clean_text(value, spec)
+    if error:
+        return None, error
+    value = value.replace(" ", "").lower()
+    if value and not EMAIL_PATTERN.match(value):
+        return None, "is not a valid email address"
+    return value, None
+
+def _clean_mobile(value, spec):
+    value, error = _clean_text(value, spec)
+    if error:
+        return None, error
+    if not value:
+        return value, None
+    mobile = normalize_saudi_mobile(value)
+    if mobile is None:
+        return None, "is not a valid Saudi mobile number"
+    return mobile, None
+
+def _clean_timeframe(value, spec):
+    value, error = _clean_text(value, spec)
+    if error:
+        return None, error
+    return get_purchase_timeframe(value) if value else value, None
+
+LEAD_FIELD_TYPES = {
+    "text": _clean_text,
+    "email": _clean_email,
+    "mobile": _clean_mobile,
+    "timeframe": _clean_timeframe
+}
+
+# Salesforce lead fields checked before any outbound call; lengths follow the Lead object
+LEAD_SCHEMA = {
+    "Firstname": {"type": "text", "required": True, "max_length": 40},
+    "Lastname": {"type": "text", "required": True, "max_length": 80},
+    "Mobile": {"type": "mobile", "required": True},
+    "Email": {"type": "email", "required": True, "max_length": 80},
+    "Campaign_Source": {"type": "text", "max_length": 40},
+    "Campaign_Name": {"type": "text", "max_length": 80},
+    "Purchase_Time_Frame": {"type": "timeframe"},
+    "Purchase_TimeFrame": {"type": "timeframe"}
+}
+
+def build_lead_validator(schema):
+    """Compile a schema into a function returning (cleaned_lead, errors).
+
+    Known fields are repaired in place where possible (whitespace, Unicode
+    forms, phone formats, truncation to the Salesforce length); anything that
+    can't be repaired is reported so the lead is rejected before it costs an
+    OAuth login or an API call. Unknown fields pass through untouched.
+    """
+    checks = [
+        (field, LEAD_FIELD_TYPES[spec["type"]], spec.get("required", False), spec)
+        for field, spec in schema.items()
+    ]
+    
+    def validate(lead):
+        if not isinstance(lead, dict):
+            return None, ["Payload must be a JSON object"]
+        cleaned = dict(lead)
+        errors = []
+        for field, clean, required, spec in checks:
+            value = cleaned.get(field)
+            if value is None or value == "" or (isinstance(value, float) and math.isnan(value)):
+                if required:
+                    errors.append(f"Missing required field: {field}")
+                elif value is None and field in cleaned:
+                    # A JSON null means the platform didn't fill it in
+                    del cleaned[field]
+                continue
+            value, error = clean(value, spec)
+            if error:
+                errors.append(f"{field} {error}")
+            elif required and not value:
+                errors.append(f"Missing required field: {field}")
+            else:
+                cleaned[field] = value
+        return cleaned, errors
+    
+    return validate
+
+validate_lead = build_lead_validator(LEAD_SCHEMA)
+
+# Dealer fields sent with every lead unless its route names another profile
+DEFAULT_DEALER_PROFILE = {
+    "Enquiry_Type": "Book_a_Test_Drive",
+    "DealerCode": "PTC",
+    "Shrm_SvCtr": "PETROMIN Jubail",
+    "Make": "Jeep",
+    "Line": "Wrangler",
+    "Entry_Form": "EN",
+    "Market": "Saudi Arabia",
+    "Campaign_Medium": "Boopin",
+    "TestDriveType": "In Showroom",
+    "Extended_Privacy": "true",
+    "Marketing_Communication_Consent": "1",
+    "Fund": "DD",
+    "FormCode": "PET_Q2_25",
+    "Request_Origin": "https://www.jeep-saudi.com",
+    "MasterKey": "Jeep_EN_GENERIC_RI:RP:TD_0_8_1_6_50_42"
+}
+
+def new_lead(firstname, lastname, mobile, email, source, campaign,
+             purchase_time_frame="More than 3 months", source_site=None):
+    """Salesforce lead payload with the standard dealer fields"""
+    if source_site is None:
+        source_site = str(source).lower() + " Ads" if source else ""
+    profile = DEFAULT_DEALER_PROFILE
+    return {
+        "Enquiry_Type": profile["Enquiry_Type"],
+        "Firstname": firstname,
+        "Lastname": lastname,
+        "Mobile": mobile,
+        "Email": email,
+        "DealerCode": profile["DealerCode"],
+        "Shrm_SvCtr": profile["Shrm_SvCtr"],
+        "Make": profile["Make"],
+        "Line": profile["Line"],
+        "Entry_Form": profile["Entry_Form"],
+        "Market": profile["Market"],
+        "Campaign_Source": source,
+        "Campaign_Name": campaign,
+        "Campaign_Medium": profile["Campaign_Medium"],
+        "TestDriveType": profile["TestDriveType"],
+        "Extended_Privacy": profile["Extended_Privacy"],
+        "Purchase_Time_Frame": purchase_time_frame,  # Only use the correct field
+        "Source_Site": source_site,
+        "Marketing_Communication_Consent": profile["Marketing_Communication_Consent"],
+        "Fund": profile["Fund"],
+        "FormCode": profile["FormCode"],
+        "Request_Origin": profile["Request_Origin"],
+        "MasterKey": profile["MasterKey"]
     }
-    response = requests.post(TOKEN_URL, data=payload)
-    response.raise_for_status()
-    return response.json()
+
+def lead_from_log_row(log_name, row):
+    """Rebuild the Salesforce payload for a row read back from one of the lead logs"""
+    row = {k: v for k, v in dict(row).items() if not (isinstance(v, float) and math.isnan(v))}
+    
+    if log_name == "leads":
+        # leads.csv rows already hold the full payload that was sent, under
+        # the log's own column names
+        lead_data = {k: v for k, v in row.items() if k not in ("ID", "Timestamp", "Status", "Error")}
+        for column, field in LEADS_COLUMN_FIELDS.items():
+            if column in lead_data:
+                lead_data.setdefault(field, lead_data.pop(column))
+        return lead_data
+    
+    if log_name == "google":
+        return new_lead(
+            row.get("FirstName", ""),
+            row.get("LastName", ""),
+            row.get("Phone", ""),
+            row.get("Email", ""),
+            "Google",
+            row.get("CampaignName", "Google Ads"),
+            source_site="google ads"
+        )
+    
+    purchase_time_frame = "More than 3 months"
+    if row.get("Purchase_Time_Frame"):
+        purchase_time_frame = get_purchase_timeframe(row["Purchase_Time_Frame"])
+    elif row.get("Purchase_TimeFrame"):
+        purchase_time_frame = get_purchase_timeframe(row["Purchase_TimeFrame"])
+    return new_lead(
+        row.get("Firstname", ""),
+        row.get("Lastname", ""),
+        row.get("Mobile", ""),
+        row.get("Email", ""),
+        row.get("Campaign_Source", ""),
+        row.get("Campaign_Name", ""),
+        purchase_time_frame
+    )
+
+class TokenBucket:
+    """Token bucket refilled continuously at rate tokens per second"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def state(self):
+        self.refill()
+        return {
+            "rate_per_minute": round(self.rate * 60, 2),
+            "capacity": self.capacity,
+            "tokens": round(self.tokens, 2)
+        }
+
+class SalesforceOrg:
+    """One Salesforce org with its own token cache, connection pool and API budget.
+
+    Nothing is shared between orgs, so a slow login or a backlog of calls to one
+    org never holds up deliveries to another.
+    """
+
+    def __init__(self, name, token_url, client_id, client_secret, username, password,
+                 rate_per_minute=SF_API_RATE_PER_MINUTE, burst=SF_API_BURST, pool_size=16):
+        self.name = name
+        self.token_url = token_url
+        self.credentials = {
+            "grant_type": "password",
+            "client_id": client_id,
+            "client_secret": client_secret,
+            "username": username,
+            "password": password
+        }
+        # Calls share one pooled session so TLS connections are reused
+        self.session = requests.Session()
+        self.session.mount("https://", requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=pool_size))
+        self.token = None
+        self.expires = 0
+        self.token_lock = threading.Lock()
+        self.bucket = TokenBucket(rate_per_minute / 60 / WEB_CONCURRENCY, burst)
+        self.pool_size = pool_size
+        self.pool = None
+        self.pool_lock = threading.Lock()
+
+    def get_token(self, stale=None):
+        """Obtain an OAuth2 token, reusing the cached one until it expires.
+
+        Pass the token that was just rejected as stale to force a new login,
+        unless another thread has already replaced it.
+        """
+        with self.token_lock:
+            if self.token and self.token is not stale and time.monotonic() < self.expires:
+                return self.token
+            
+            response = self.session.post(self.token_url, data=self.credentials, timeout=SF_REQUEST_TIMEOUT)
+            response.raise_for_status()
+            self.token = response.json()
+            self.expires = time.monotonic() + SF_TOKEN_TTL
+            return self.token
+
+    def send(self, token, lead_data):
+        """Send lead data to this org's lead API, returning (status, response text)"""
+        for attempt in range(2):
+            headers = {
+                "Authorization": f"Bearer {token['access_token']}",
+                "Content-Type": "application/json"
+            }
+            instance_url = token["instance_url"]
+            response = self.session.post(instance_url + LEAD_API_PATH, headers=headers, json=lead_data,
+                                         timeout=SF_REQUEST_TIMEOUT)
+            if response.status_code != 401 or attempt:
+                break
+            # The cached session expired or was revoked; log in again once
+            token = self.get_token(stale=token)
+        return response.status_code, response.text
+
+    def submit(self, fn, *args):
+        """Run fn on this org's own delivery threads"""
+        with self.pool_lock:
+            if self.pool is None:
+                self.pool = ThreadPoolExecutor(self.pool_size, thread_name_prefix=f"sf-{self.name}")
+        return self.pool.submit(fn, *args)
+
+class DeliveryTarget:
+    """A Salesforce org plus the dealer profile leads are delivered with there"""
+
+    def __init__(self, org, profile_name=None, profile=None):
+        self.org = org
+        self.profile_name = profile_name
+        self.profile = profile
+
+    @property
+    def label(self):
+        return f"{self.org.name}/{self.profile_name}" if self.profile_name else self.org.name
+
+    def payload(self, lead_data):
+        """The lead with this target's dealer fields swapped in"""
+        if not self.profile:
+            return lead_data
+        payload = dict(lead_data)
+        payload.update(self.profile)
+        return payload
+
+class LeadRouter:
+    """Map a lead's Campaign_Source and Campaign_Name to its delivery targets.
+
+    Routes are checked in order and the first whose shell-style patterns match
+    both fields wins; leads matching none go to the default targets.
+    """
+
+    def __init__(self, orgs, profiles, routes, default):
+        self.orgs = orgs
+        self.profiles = profiles
+        self.routes = [
+            (route.get("source", "*").lower(), route.get("campaign", "*").lower(), self._targets(route["deliver"]))
+            for route in routes
+        ]
+        self.default = self._targets(default)
+
+    def _targets(self, specs):
+        targets = []
+        for spec in specs:
+            if spec["org"] not in self.orgs:
+                raise ValueError(f"Lead routing refers to unknown org {spec['org']!r}")
+            profile_name = spec.get("profile")
+            if profile_name and profile_name not in self.profiles:
+                raise ValueError(f"Lead routing refers to unknown profile {profile_name!r}")
+            targets.append(DeliveryTarget(self.orgs[spec["org"]], profile_name, self.profiles.get(profile_name)))
+        return targets
+
+    def targets(self, lead_data):
+        source = str(lead_data.get("Campaign_Source") or "").lower()
+        campaign = str(lead_data.get("Campaign_Name") or "").lower()
+        for source_pattern, campaign_pattern, targets in self.routes:
+            if fnmatch.fnmatchcase(source, source_pattern) and fnmatch.fnmatchcase(campaign, campaign_pattern):
+                return targets
+        return self.default
+
+    def target(self, label):
+        """Rebuild a target from its label, or None if the org or profile is gone"""
+        org_name, _, profile_name = label.partition("/")
+        if org_name not in self.orgs or (profile_name and profile_name not in self.profiles):
+            return None
+        return DeliveryTarget(self.orgs[org_name], profile_name or None, self.profiles.get(profile_name))
+
+def load_lead_routing(path):
+    """Build the Salesforce orgs and lead router from the routing file.
+
+    The "default" org always exists and is configured from CLIENT_ID, TOKEN_URL
+    and friends. Other orgs read the same variables behind their env_prefix,
+    e.g. KIA_CLIENT_ID, so no credentials live in the file.
+    """
+    config = {}
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            config = json.load(f)
+    
+    org_configs = {"default": {}}
+    org_configs.update(config.get("orgs", {}))
+    orgs = {}
+    for name, org in org_configs.items():
+        prefix = org.get("env_prefix", "" if name == "default" else f"{name.upper()}_")
+        orgs[name] = SalesforceOrg(
+            name,
+            org.get("token_url") or os.getenv(f"{prefix}TOKEN_URL"),
+            os.getenv(f"{prefix}CLIENT_ID"),
+            os.getenv(f"{prefix}CLIENT_SECRET"),
+            os.getenv(f"{prefix}USERNAME"),
+            os.getenv(f"{prefix}PASSWORD"),
+            rate_per_minute=float(org.get("rate_per_minute", SF_API_RATE_PER_MINUTE)),
+            burst=float(org.get("burst", SF_API_BURST)),
+            pool_size=int(org.get("pool_size", 16))
+        )
+    
+    profiles = {"default": DEFAULT_DEALER_PROFILE}
+    profiles.update(config.get("profiles", {}))
+    router = LeadRouter(orgs, profiles, config.get("routes", []), config.get("default", [{"org": "default"}]))
+    return orgs, router
+
+salesforce_orgs, lead_router = load_lead_routing(LEAD_ROUTING_FILE)
+
+def failed_row_targets(row):
+    """The target a failed_leads.csv row was rejected by, or None to route it afresh"""
+    match = re.fullmatch(r"API Error \((.+)\)", str(row.get("Error", "")))
+    target = lead_router.target(match.group(1)) if match else None
+    return [target] if target else None
+
+def get_salesforce_token(stale=None):
+    """OAuth2 token for the default Salesforce org"""
+    return salesforce_orgs["default"].get_token(stale)
 
 def send_to_salesforce(token, lead_data):
-    """Send lead data to Salesforce API"""
-    headers = {
-        "Authorization": f"Bearer {token['access_token']}",
-        "Content-Type": "application/json"
-    }
-    instance_url = token["instance_url"]
-    response = requests.post(instance_url + LEAD_API_PATH, headers=headers, json=lead_data)
-    return response.status_code, response.text
+    """Send lead data to the default Salesforce org"""
+    return salesforce_orgs["default"].send(token, lead_data)
+
+@contextmanager
+def log_lock(log_name):
+    """Hold an exclusive lock on a lead log across workers.
+
+    Appends take it briefly; read-modify-rewrite cycles hold it throughout so
+    rows appended meanwhile aren't lost when the file is replaced.
+    """
+    with open(LEAD_LOGS[log_name] + ".lock", "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        yield
 
 def log_lead(lead_data, status=200, error=""):
-    """Log successful lead to CSV"""
+    """Log successful lead to CSV.
+
+    Values are written under the columns of the file's own header, so the
+    order of lead_data's keys doesn't matter.
+    """
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    file_exists = os.path.exists("leads.csv")
-    
-    with open("leads.csv", "a", newline="") as f:
-        writer = csv.writer(f)
-        if not file_exists:
-            headers = ["Timestamp", "Status", "Error"] + list(lead_data.keys())
-            writer.writerow(headers)
-        
-        row = [timestamp, status, error] + list(lead_data.values())
-        writer.writerow(row)
+    row = dict(lead_data, Timestamp=timestamp, Status=status, Error=error)
+    for column, field in LEADS_COLUMN_FIELDS.items():
+        if field in row:
+            row.setdefault(column, row[field])
+    
+    with log_lock("leads"):
+        header = log_columns("leads") if os.path.exists("leads.csv") else []
+        with open("leads.csv", "a", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=header or LEADS_HEADER, extrasaction="ignore")
+            if not header:
+                writer.writeheader()
+            writer.writerow(row)
+    note_log_write("leads")
+
+def log_failed_lead(lead_data, status, response, target="default", error=None):
+    """Log failed lead to CSV, noting which delivery target rejected it.
 
-def log_failed_lead(lead_data, status, response):
-    """Log failed lead to CSV"""
+    error overrides the Error column, e.g. for leads refused before sending.
+    """
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     file_exists = os.path.exists("failed_leads.csv")
     
-    with open("failed_leads.csv", "a", newline="") as f:
+    with log_lock("failed"), open("failed_leads.csv", "a", newline="") as f:
         writer = csv.writer(f)
         if not file_exists:
             writer.writerow(["Timestamp", "Error", "Status", "Response", "Firstname", 
@@ -91,7 +635,7 @@ def log_failed_lead(lead_data, status, response):
         
         writer.writerow([
             timestamp, 
-            "API Error", 
+            error or ("API Error" if target == "default" else f"API Error ({target})"), 
             status, 
             response,
             lead_data.get("Firstname", ""),
@@ -101,50 +645,1297 @@ def log_failed_lead(lead_data, status, response):
             lead_data.get("Campaign_Source", ""),
             lead_data.get("Campaign_Name", "")
         ])
+    note_log_write("failed")
 
-@app.route("/form", methods=["GET", "POST"])
-def form():
-    """Handle test lead submission form"""
-    if request.method == "POST":
-        data = {
-            "Enquiry_Type": "Book_a_Test_Drive",
-            "Firstname": request.form["firstname"],
-            "Lastname": request.form["lastname"],
-            "Mobile": request.form["mobile"],
-            "Email": request.form["email"],
-            "DealerCode": "PTC",
-            "Shrm_SvCtr": "PETROMIN Jubail",
-            "Make": "Jeep",
-            "Line": "Wrangler",
-            "Entry_Form": "EN",
-            "Market": "Saudi Arabia",
-            "Campaign_Source": request.form["source"],
-            "Campaign_Name": request.form["campaign"],
-            "Campaign_Medium": "Boopin",
-            "TestDriveType": "In Showroom",
-            "Extended_Privacy": "true",
-            "Purchase_Time_Frame": "More than 3 months",
-            "Source_Site": request.form["source"].lower() + " Ads",
-            "Marketing_Communication_Consent": "1",
-            "Fund": "DD",
-            "FormCode": "PET_Q2_25",
-            "Request_Origin": "https://www.jeep-saudi.com",
-            "MasterKey": "Jeep_EN_GENERIC_RI:RP:TD_0_8_1_6_50_42"
-        }
+def log_invalid_lead(lead_data, errors):
+    """Keep a lead that failed validation in failed_leads.csv so it can be fixed and retried.
+
+    Nothing is sent to Salesforce; payloads that aren't even a JSON object are
+    logged with empty fields so the attempt is still visible.
+    """
+    if not isinstance(lead_data, dict):
+        lead_data = {}
+    log_failed_lead(lead_data, 400, "; ".join(errors), error="Validation Error")
+
+# Most of a lead log read into memory at once when catching up on it
+LOG_READ_BYTES = 2 * 1024 * 1024
+
+def complete_rows_end(chunk):
+    """Length of the part of chunk made up of complete CSV rows.
+
+    A newline ends a row only outside quotes, i.e. after an even number of
+    quote characters since the row began (escaped quotes come in pairs).
+    """
+    end = 0
+    position = 0
+    quoted = False
+    lines = chunk.split(b"\n")
+    lines.pop()  # Whatever follows the last newline isn't a whole line yet
+    for line in lines:
+        position += len(line) + 1
+        if line.count(b'"') % 2:
+            quoted = not quoted
+        if not quoted:
+            end = position
+    return end
+
+class LogFollower:
+    """Read rows appended to a CSV log since the previous poll"""
+
+    ANCHOR_SIZE = 64
+
+    def __init__(self, path):
+        self.path = path
+        self._forget()
+
+    def _forget(self):
+        self.behind = False
+        self.inode = None
+        self.offset = 0
+        self.anchor = b""
+        self.header = None
+
+    def _anchor_matches(self, f):
+        """Check the bytes just before our offset are still the ones we read"""
+        if not self.anchor:
+            return True
+        f.seek(self.offset - len(self.anchor))
+        return f.read(len(self.anchor)) == self.anchor
+
+    def poll(self, max_bytes=None):
+        """Return (reset, header, rows) for complete rows appended since the last poll.
+
+        reset is True when the file was replaced, truncated or rewritten, in which
+        case the rows start again from the top of the file and anything built from
+        earlier polls must be discarded. With max_bytes, about that much of the
+        file is read and self.behind says whether more whole rows may follow.
+        """
+        self.behind = False
         try:
-            token = get_salesforce_token()
-            status, response = send_to_salesforce(token, data)
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            reset = self.inode is not None
+            self._forget()
+            return reset, None, []
+
+        with open(self.path, "rb") as f:
+            reset = self.inode is not None and (
+                stat.st_ino != self.inode
+                or stat.st_size < self.offset
+                or not self._anchor_matches(f)
+            )
+            if reset:
+                self._forget()
+            self.inode = stat.st_ino
+
+            if stat.st_size == self.offset:
+                return reset, self.header, []
+            f.seek(self.offset)
+            remaining = stat.st_size - self.offset
+            chunk = f.read(min(remaining, max_bytes or remaining))
+            end = complete_rows_end(chunk)
+            # A single row longer than max_bytes is read through to its end
+            while end == 0 and len(chunk) < remaining:
+                chunk += f.read(min(remaining - len(chunk), max_bytes))
+                end = complete_rows_end(chunk)
+
+        # Only consume whole rows; a writer may be halfway through one, and a
+        # quoted value (such as a multi-line error response) can span a read
+        if end == 0:
+            return reset, self.header, []
+        chunk = chunk[:end]
+        self.offset += end
+        self.anchor = (self.anchor + chunk)[-self.ANCHOR_SIZE:]
+        self.behind = self.offset < stat.st_size
+
+        rows = [row for row in csv.reader(io.StringIO(chunk.decode("utf-8", errors="replace"))) if row]
+        if self.header is None and rows:
+            self.header = rows.pop(0)
+        return reset, self.header, rows
+
+    def batches(self, max_bytes=None):
+        """Yield (reset, header, rows) batches of about max_bytes until caught up.
+
+        Only the first batch can have reset set; the rows of each batch can be
+        folded in and dropped before the next one is read, so catching up on a
+        long history never holds all of it in memory at once.
+        """
+        while True:
+            yield self.poll(max_bytes or LOG_READ_BYTES)
+            if not self.behind:
+                return
+
+class LeadSearchIndex:
+    """Trigram index for case-insensitive substring search over a lead log.
+
+    Row ids are the 0-based data row positions, which match the default index
+    pandas gives the same file, so results can be applied with df.index.isin().
+    """
+
+    def __init__(self, path, fields):
+        self.follower = LogFollower(path)
+        self.fields = fields
+        self.lock = threading.Lock()
+        self._clear()
+
+    def _clear(self):
+        # Each row's lowercased text, UTF-8 encoded back to back; row i is
+        # texts[offsets[i]:offsets[i + 1]]
+        self.texts = bytearray()
+        self.offsets = array("Q", [0])
+        self.postings = {}
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def text(self, row_id):
+        return self.texts[self.offsets[row_id]:self.offsets[row_id + 1]]
+
+    def _scan(self, needle):
+        """Row ids whose text contains needle, found by searching all of texts"""
+        if not needle:
+            return list(range(len(self)))
+        found = []
+        start = self.texts.find(needle)
+        while start != -1:
+            row_id = bisect.bisect_right(self.offsets, start) - 1
+            end = self.offsets[row_id + 1]
+            if start + len(needle) <= end:
+                found.append(row_id)
+                start = self.texts.find(needle, end)
+            else:
+                # Straddles two rows; look again from the next byte
+                start = self.texts.find(needle, start + 1)
+        return found
+
+    def refresh(self):
+        """Index any rows appended to the log since the last refresh"""
+        for reset, header, rows in self.follower.batches():
+            if reset:
+                self._clear()
+            if rows:
+                self._add(header, rows)
+
+    def _add(self, header, rows):
+        positions = [header.index(field) for field in self.fields if field in header]
+        for row in rows:
+            row_id = len(self)
+            # Fields are separated so trigrams never span two columns
+            text = "\0".join(row[p] for p in positions if p < len(row)).lower()
+            self.texts += text.encode("utf-8")
+            self.offsets.append(len(self.texts))
+            for gram in {text[i:i + 3] for i in range(len(text) - 2)}:
+                if "\0" in gram:
+                    continue
+                posting = self.postings.get(gram)
+                if posting is None:
+                    posting = self.postings[gram] = array("I")
+                posting.append(row_id)
+
+    def search(self, query):
+        """Return the sorted row ids whose name, email or mobile contains query"""
+        query = query.lower()
+        needle = query.encode("utf-8")
+        with self.lock:
+            self.refresh()
+            if len(query) < 3:
+                return self._scan(needle)
+
+            # Verify candidates from the rarest trigram of the query
+            grams = {query[i:i + 3] for i in range(len(query) - 2)}
+            rarest = None
+            for gram in grams:
+                posting = self.postings.get(gram)
+                if posting is None:
+                    return []
+                if rarest is None or len(posting) < len(rarest):
+                    rarest = posting
+            return [i for i in rarest if needle in self.text(i)]
+
+search_indexes = {name: LeadSearchIndex(path, SEARCH_FIELDS[name]) for name, path in LEAD_LOGS.items()}
+
+def search_leads(log_name, query):
+    """Row ids in the given lead log matching a name, email or mobile search"""
+    return search_indexes[log_name].search(query)
+
+class LeadRollup:
+    """Hourly lead counts by source, campaign and outcome for one lead log"""
+
+    def __init__(self, path, source_column, campaign_column, outcome, default_source=""):
+        self.follower = LogFollower(path)
+        self.source_column = source_column
+        self.campaign_column = campaign_column
+        self.outcome = outcome
+        self.default_source = default_source
+        self.lock = threading.Lock()
+        self.counts = {}
+
+    def refresh(self):
+        """Fold rows appended to the log since the last refresh into the counts"""
+        with self.lock:
+            for reset, header, rows in self.follower.batches():
+                if reset:
+                    self.counts = {}
+                if rows:
+                    self._fold(header, rows)
+
+    def _fold(self, header, rows):
+        def position(column):
+            return header.index(column) if column and column in header else None
+
+        timestamp_pos = position("Timestamp")
+        source_pos = position(self.source_column)
+        campaign_pos = position(self.campaign_column)
+        for row in rows:
+            # Timestamps are "YYYY-MM-DD HH:MM:SS" or ISO with a "T"
+            timestamp = row[timestamp_pos] if timestamp_pos is not None and timestamp_pos < len(row) else ""
+            if len(timestamp) < 13 or timestamp[4] != "-":
+                continue
+            hour = timestamp[:10] + " " + timestamp[11:13]
+            source = row[source_pos] if source_pos is not None and source_pos < len(row) else self.default_source
+            campaign = row[campaign_pos] if campaign_pos is not None and campaign_pos < len(row) else ""
+            key = (hour, source or self.default_source, campaign)
+            self.counts[key] = self.counts.get(key, 0) + 1
+
+    def items(self):
+        """Snapshot of ((hour, source, campaign), count) pairs"""
+        self.refresh()
+        with self.lock:
+            return list(self.counts.items())
+
+rollups = {
+    "leads": LeadRollup(LEAD_LOGS["leads"], "Campaign_Source", "Campaign_Name", "success"),
+    "failed": LeadRollup(LEAD_LOGS["failed"], "Campaign_Source", "Campaign_Name", "failed"),
+    "google": LeadRollup(LEAD_LOGS["google"], None, "CampaignName", "received", default_source="Google")
+}
+
+# Bucket key length for each grain; "all" folds the whole range into one bucket
+ROLLUP_GRAINS = {"hour": 13, "day": 10, "month": 7, "all": 0}
+ROLLUP_GROUPS = ["source", "campaign", "status"]
+
+def query_rollups(log_names, grain="day", group=(), start=None, end=None):
+    """Sum rollup counts into grain-sized buckets, split by the requested dimensions.
+
+    start and end are inclusive and may be given at any precision from
+    "YYYY" down to "YYYY-MM-DD HH".
+    """
+    width = ROLLUP_GRAINS[grain]
+    totals = {}
+    for log_name in log_names:
+        rollup = rollups[log_name]
+        for (hour, source, campaign), count in rollup.items():
+            if start and hour[:len(start)] < start:
+                continue
+            if end and hour[:len(end)] > end:
+                continue
+            dimensions = {"source": source, "campaign": campaign, "status": rollup.outcome}
+            key = (hour[:width],) + tuple(dimensions[name] for name in group)
+            totals[key] = totals.get(key, 0) + count
+
+    return [
+        dict(zip(("bucket",) + tuple(group), key), count=count)
+        for key, count in sorted(totals.items())
+    ]
+
+# pandas resample rule and default window in days for each analytics grain
+ANALYTICS_GRAINS = {"hour": ("h", 2), "day": ("D", 30), "week": ("W-MON", 84)}
+ANALYTICS_MAX_BUCKETS = 2000
+ANALYTICS_CACHE_SIZE = int(os.getenv("ANALYTICS_CACHE_SIZE", "128"))
+
+def rollup_frame(log_names):
+    """The hourly rollup counts of the given logs as one DataFrame"""
+    frames = []
+    for log_name in log_names:
+        rollup = rollups[log_name]
+        items = rollup.items()
+        if not items:
+            continue
+        keys, counts = zip(*items)
+        hours, sources, campaigns = zip(*keys)
+        frames.append(pd.DataFrame({
+            "hour": pd.to_datetime(pd.Series(hours), format="%Y-%m-%d %H", errors="coerce"),
+            "source": sources,
+            "campaign": campaigns,
+            "status": rollup.outcome,
+            "count": counts
+        }))
+    if not frames:
+        return pd.DataFrame(columns=["hour", "source", "campaign", "status", "count"])
+    return pd.concat(frames, ignore_index=True)
+
+@functools.lru_cache(maxsize=ANALYTICS_CACHE_SIZE)
+def analytics_series(log_names, grain, group, start, end, top, versions):
+    """Zero-filled time series of lead counts from start to end (inclusive dates).
+
+    versions is only part of the cache key: the log fingerprints at request
+    time, so any write to the logs makes the next identical query recompute.
+    Groups beyond the top largest are folded into an "Other" series.
+    """
+    rule = ANALYTICS_GRAINS[grain][0]
+    hours = pd.date_range(start, end + timedelta(hours=23), freq="h")
+    
+    df = rollup_frame(log_names)
+    df = df[(df["hour"] >= hours[0]) & (df["hour"] <= hours[-1])]
+    if group:
+        table = df.pivot_table(index="hour", columns=group, values="count", aggfunc="sum", fill_value=0)
+    else:
+        table = df.groupby("hour")["count"].sum().to_frame("total")
+    
+    # Continuous hourly index first so empty hours, days and weeks come back as zeros
+    table = table.reindex(hours, fill_value=0).resample(rule, closed="left", label="left").sum()
+    table = table[table.sum().sort_values(ascending=False, kind="stable").index]
+    if len(table.columns) > top:
+        table["Other"] = table[table.columns[top:]].sum(axis=1)
+        table = table[list(table.columns[:top]) + ["Other"]]
+    
+    label_format = "%Y-%m-%d %H:00" if grain == "hour" else "%Y-%m-%d"
+    return {
+        "log": list(log_names),
+        "grain": grain,
+        "group": group,
+        "from": start.strftime("%Y-%m-%d"),
+        "to": end.strftime("%Y-%m-%d"),
+        "labels": list(table.index.strftime(label_format)),
+        "series": [
+            {"name": str(name), "data": [int(count) for count in table[name]], "total": int(table[name].sum())}
+            for name in table.columns
+        ],
+        "total": int(table.to_numpy().sum())
+    }
+
+class LiveEventHub:
+    """Fan lead activity out to every connected /api/stream client.
+
+    A single producer thread per worker tails the lead logs, so events written
+    by any worker reach every browser tab while N open tabs still cost one
+    reader. Each subscriber gets a bounded queue; a client too slow to drain it
+    misses events rather than holding up the others.
+    """
+
+    # Rows appended to each log are announced under these event names
+    ROW_EVENTS = {"leads": "delivered", "failed": "failed", "google": "lead-accepted"}
+
+    def __init__(self, interval=1.0, max_subscribers=LIVE_STREAM_LIMIT):
+        self.interval = interval
+        self.max_subscribers = max_subscribers
+        self.followers = {name: LogFollower(path) for name, path in LEAD_LOGS.items()}
+        self.counts = dict.fromkeys(LEAD_LOGS, 0)
+        self.last_time = "-"
+        self.primed = False
+        self.subscribers = set()
+        self.lock = threading.Lock()
+        self.scan_lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.thread = None
+
+    def subscribe(self):
+        """Register a new client, or return None when the hub is full"""
+        with self.lock:
+            if len(self.subscribers) >= self.max_subscribers:
+                return None
+            subscriber = queue.Queue(maxsize=100)
+            self.subscribers.add(subscriber)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="live-events", daemon=True)
+                self.thread.start()
+        self.scan()
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self.lock:
+            self.subscribers.discard(subscriber)
+
+    def publish(self, event, data):
+        """Queue an event for every subscriber"""
+        with self.lock:
+            subscribers = list(self.subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait((event, data))
+            except queue.Full:
+                pass
+
+    def poke(self):
+        """Ask the producer to look at the logs now instead of at the next tick"""
+        self.wakeup.set()
+
+    def state(self):
+        with self.lock:
+            return {"limit": self.max_subscribers, "open": len(self.subscribers)}
+
+    def counters(self):
+        return {
+            "lead_count": self.counts["leads"],
+            "failed_count": self.counts["failed"],
+            "google_count": self.counts["google"],
+            "last_time": self.last_time
+        }
+
+    def scan(self):
+        """Read new rows from every log and publish events and counters for them"""
+        with self.scan_lock:
+            with self.lock:
+                if not self.subscribers:
+                    # Nobody is listening; catch up silently once someone is
+                    self.primed = False
+                    return
+            changed = False
+            for name, follower in self.followers.items():
+                announce = self.primed
+                for reset, header, rows in follower.batches():
+                    if reset:
+                        self.counts[name] = 0
+                        changed = True
+                        announce = False
+                    if not rows:
+                        continue
+                    changed = True
+                    self.counts[name] += len(rows)
+                    if name == "leads" and "Timestamp" in header:
+                        position = header.index("Timestamp")
+                        if position < len(rows[-1]):
+                            self.last_time = format_timestamp_for_display(rows[-1][position])
+                    if announce:
+                        for row in rows:
+                            self.publish(self.ROW_EVENTS[name], self._describe(name, header, row))
+            if changed or not self.primed:
+                self.publish("counters", self.counters())
+            self.primed = True
+
+    def _describe(self, log_name, header, row):
+        values = dict(zip(header, row))
+        first_name, last_name = SEARCH_FIELDS[log_name][:2]
+        return {
+            "log": log_name,
+            "name": f"{values.get(first_name, '')} {values.get(last_name, '')}".strip(),
+            "source": values.get("Campaign_Source", "Google" if log_name == "google" else ""),
+            "campaign": values.get("Campaign_Name", values.get("CampaignName", "")),
+            "timestamp": values.get("Timestamp", "")
+        }
+
+    def _run(self):
+        while True:
+            self.wakeup.wait(self.interval)
+            self.wakeup.clear()
+            try:
+                self.scan()
+            except Exception as e:
+                print(f"Live event scan failed: {str(e)}")
+
+live_events = LiveEventHub()
+
+def format_sse(event, data):
+    """Encode one Server-Sent Events message"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def note_log_write(log_name):
+    """Called after anything is appended to or rewritten in a lead log"""
+    # Rollups catch up on their next read, so a rewrite that makes them
+    # rebuild never holds up the ingesting request
+    output_cache.invalidate(log_name)
+    live_events.poke()
+
+def stat_fingerprint(stat):
+    """Fingerprint of a file's identity, size and modification time"""
+    return f"{stat.st_ino:x}-{stat.st_size:x}-{stat.st_mtime_ns:x}"
+
+def log_version(log_name):
+    """Return (fingerprint, mtime) for a lead log, changing whenever it is written.
+
+    Every append or rewrite changes the file's size, mtime or inode, so the
+    fingerprint is consistent across workers without any shared state.
+    """
+    try:
+        stat = os.stat(LEAD_LOGS[log_name])
+    except FileNotFoundError:
+        return "none", None
+    return stat_fingerprint(stat), stat.st_mtime
+
+def conditional_on_logs(*log_names, daily=False):
+    """Answer GET requests with 304 when the given logs haven't changed.
+
+    The ETag covers the route, its query parameters and the log versions, and
+    is checked before the view runs so unchanged pages cost a few stat() calls.
+    Views whose output also depends on today's date pass daily=True.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            versions = [log_version(name) for name in log_names]
+            key = [request.path, sorted(request.args.items(multi=True))]
+            key += [fingerprint for fingerprint, _ in versions]
+            if daily:
+                key.append(datetime.now().strftime("%Y-%m-%d"))
+            etag = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
             
-            if 200 <= status < 300:
-                log_lead(data, status)
-                return redirect(url_for("index"))
+            mtimes = [mtime for _, mtime in versions if mtime]
+            last_modified = None
+            if mtimes:
+                last_modified = datetime.fromtimestamp(int(max(mtimes)), timezone.utc)
+            
+            if request.if_none_match:
+                not_modified = request.if_none_match.contains(etag)
             else:
-                log_failed_lead(data, status, response)
-                return redirect(url_for("index"))
-                
+                not_modified = (
+                    not daily
+                    and last_modified is not None
+                    and request.if_modified_since is not None
+                    and last_modified <= request.if_modified_since
+                )
+            
+            if not_modified:
+                response = make_response("", 304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            
+            response.set_etag(etag)
+            if last_modified:
+                response.last_modified = last_modified
+            # Let browsers keep the copy but always revalidate it
+            response.cache_control.no_cache = True
+            return response
+        return wrapper
+    return decorator
+
+# Precompressed copies of the lead logs, one per log version and encoding
+DOWNLOAD_CACHE_DIR = "download_cache"
+DOWNLOAD_ENCODINGS = ["gzip", "deflate"]
+
+def compressed_log_artifact(source, log_name, version, size, encoding):
+    """Open compressed copy of the first size bytes of a lead log, building it once per version.
+
+    The copy is returned already open, so another worker pruning it for a
+    newer version can't pull it out from under the response.
+    """
+    path = os.path.join(DOWNLOAD_CACHE_DIR, f"{log_name}-{version}.{encoding}")
+    try:
+        return open(path, "rb")
+    except FileNotFoundError:
+        pass
+    
+    os.makedirs(DOWNLOAD_CACHE_DIR, exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+    target = open(temp_path, "w+b")
+    try:
+        if encoding == "gzip":
+            compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        else:
+            compressor = zlib.compressobj(6)
+        remaining = size
+        while remaining > 0:
+            chunk = source.read(min(remaining, 1 << 20))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            target.write(compressor.compress(chunk))
+        target.write(compressor.flush())
+        target.flush()
+        os.replace(temp_path, path)
+    except BaseException:
+        target.close()
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+    target.seek(0)
+    
+    # Drop artifacts left over from older versions of this log, leaving
+    # copies other workers are still writing
+    for name in os.listdir(DOWNLOAD_CACHE_DIR):
+        if name.endswith(".tmp"):
+            continue
+        if name.startswith(f"{log_name}-") and not name.startswith(f"{log_name}-{version}."):
+            try:
+                os.remove(os.path.join(DOWNLOAD_CACHE_DIR, name))
+            except OSError:
+                pass
+    return target
+
+def send_log_download(log_name, download_name):
+    """Send a lead log as an attachment, compressed when the client accepts it.
+
+    Compressed bodies come from a cached artifact for the current log version.
+    Each encoding gets its own strong ETag, so Range and If-Range requests can
+    resume an interrupted download of exactly the same bytes. Files are sent
+    from handles opened up front, so a rewrite or prune mid-request can't
+    swap or remove them.
+    """
+    source = open(LEAD_LOGS[log_name], "rb")
+    stat = os.fstat(source.fileno())
+    version = stat_fingerprint(stat)
+    encoding = request.accept_encodings.best_match(DOWNLOAD_ENCODINGS)
+    
+    if encoding:
+        try:
+            file = compressed_log_artifact(source, log_name, version, stat.st_size, encoding)
+        finally:
+            source.close()
+        size = os.fstat(file.fileno()).st_size
+    else:
+        file = source
+        size = stat.st_size
+    
+    try:
+        response = send_file(
+            file,
+            as_attachment=True,
+            download_name=download_name,
+            mimetype="text/csv",
+            etag=f"{version}-{encoding or 'identity'}",
+            last_modified=stat.st_mtime,
+            conditional=False
+        )
+        response.content_length = size
+        response = response.make_conditional(request, accept_ranges=True, complete_length=size)
+    except BaseException:
+        file.close()
+        raise
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    response.vary.add("Accept-Encoding")
+    response.cache_control.no_cache = True
+    return response
+
+def rewrite_log(df, log_name):
+    """Replace a lead log with the contents of df"""
+    path = LEAD_LOGS[log_name]
+    temp_path = path + ".tmp"
+    df.to_csv(temp_path, index=False)
+    os.replace(temp_path, path)
+    note_log_write(log_name)
+
+
+# Rendered pages and export files, shared by all workers through the disk
+OUTPUT_CACHE_DIR = "output_cache"
+OUTPUT_CACHE_MAX_MB = float(os.getenv("OUTPUT_CACHE_MAX_MB", "256"))
+OUTPUT_CACHE_HEADERS = ["Content-Type", "Content-Disposition"]
+
+class OutputCache:
+    """Finished response bodies keyed by route, query parameters and log versions.
+
+    Each entry is one file: a JSON line with the headers, then the body. File
+    names start with the logs the entry was built from, so a write to a log can
+    drop exactly the entries that depend on it. Hits refresh the file's mtime
+    and the oldest entries are evicted once the directory outgrows max_bytes.
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+
+    def key(self, log_names, daily):
+        """Entry file name for the current request and log versions"""
+        # Query values exactly as the view will see them, so two requests only
+        # share an entry when the view can't tell them apart
+        params = sorted(request.args.items(multi=True))
+        parts = [request.path, params] + [log_version(name)[0] for name in log_names]
+        if daily:
+            parts.append(datetime.now().strftime("%Y-%m-%d"))
+        digest = hashlib.sha1(repr(parts).encode("utf-8")).hexdigest()
+        return f"{'+'.join(log_names)}--{digest}"
+
+    def get(self, key):
+        path = os.path.join(self.directory, key)
+        try:
+            with open(path, "rb") as f:
+                headers = json.loads(f.readline())
+                body = f.read()
+        except (FileNotFoundError, ValueError):
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return Response(body, headers=headers)
+
+    def put(self, key, response):
+        body = response.get_data()
+        if len(body) > self.max_bytes // 2:
+            return  # Would push out most of the cache on its own
+        headers = {name: response.headers[name] for name in OUTPUT_CACHE_HEADERS if name in response.headers}
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, key)
+        temp_path = f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(json.dumps(headers).encode("utf-8") + b"\n")
+            f.write(body)
+        os.replace(temp_path, path)
+        self.evict()
+
+    def entries(self):
+        try:
+            return [entry for entry in os.scandir(self.directory) if not entry.name.endswith(".tmp")]
+        except FileNotFoundError:
+            return []
+
+    def evict(self):
+        """Remove the least recently used entries until the cache fits again"""
+        with self.lock:
+            entries = []
+            for entry in self.entries():
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+
+    def invalidate(self, log_name):
+        """Drop every entry built from log_name; called on each write to it"""
+        for entry in self.entries():
+            if log_name in entry.name.split("--", 1)[0].split("+"):
+                try:
+                    os.remove(entry.path)
+                except FileNotFoundError:
+                    pass
+
+    def state(self):
+        entries = self.entries()
+        return {
+            "entries": len(entries),
+            "bytes": sum(entry.stat().st_size for entry in entries),
+            "max_bytes": self.max_bytes
+        }
+
+output_cache = OutputCache(OUTPUT_CACHE_DIR, int(OUTPUT_CACHE_MAX_MB * 1024 * 1024))
+
+def cached_output(*log_names, daily=False):
+    """Serve a GET view's finished 200 response from the output cache.
+
+    The entry is keyed by route, normalized query parameters and the versions
+    of the given logs, so it is rebuilt only after one of them changes. Views
+    whose output also depends on today's date pass daily=True.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            # Profiled requests always run the view
+            if REQUEST_PROFILES in request.environ:
+                return view(*args, **kwargs)
+            
+            key = output_cache.key(log_names, daily)
+            response = output_cache.get(key)
+            if response is not None:
+                response.headers["X-Output-Cache"] = "hit"
+                return response
+            
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200:
+                # send_file responses stream by default; read them into memory once
+                response.direct_passthrough = False
+                output_cache.put(key, response)
+            response.headers["X-Output-Cache"] = "miss"
+            return response
+        return wrapper
+    return decorator
+
+def deliver_to(target, lead_data, log_failed=True):
+    """Send a lead to one delivery target and log the outcome.
+
+    Returns (target, status, response); errors come back as status 500.
+    """
+    payload = target.payload(lead_data)
+    try:
+        token = target.org.get_token()
+        status, response = target.org.send(token, payload)
+    except Exception as e:
+        status, response = 500, str(e)
+    
+    if 200 <= status < 300:
+        log_lead(payload, status)
+    elif log_failed:
+        log_failed_lead(payload, status, response, target.label)
+    return target, status, response
+
+def deliver_lead(lead_data, targets=None, log_failed=True):
+    """Send a lead to every target its route names at once and log each outcome.
+
+    Each org delivers on its own threads, so a slow org only delays its own
+    result. Returns a list of (target, status, response).
+    """
+    targets = targets or lead_router.targets(lead_data)
+    if len(targets) == 1:
+        return [deliver_to(targets[0], lead_data, log_failed)]
+    futures = [target.org.submit(deliver_to, target, lead_data, log_failed) for target in targets]
+    return [future.result() for future in futures]
+
+def delivery_outcome(results):
+    """Overall (status, response) for a fan-out: the first failure, else the first success"""
+    for target, status, response in results:
+        if not 200 <= status < 300:
+            if len(results) > 1:
+                response = f"{target.label}: {response}"
+            return status, response
+    return results[0][1], results[0][2]
+
+# How often a bulk job waiting for API budget checks the buckets again
+ADMISSION_POLL_SECONDS = 0.2
+
+class AdmissionController:
+    """Admit Salesforce deliveries against each target org's bucket and one bucket per Campaign_Source"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.source_buckets = {}
+        self.source_rates = {}
+        for item in SOURCE_RATE_OVERRIDES.split(","):
+            if ":" in item:
+                source, rate = item.split(":", 1)
+                self.source_rates[source.strip().lower()] = float(rate)
+
+    def _source_bucket(self, source):
+        key = str(source or "unknown").strip().lower()
+        bucket = self.source_buckets.get(key)
+        if bucket is None:
+            rate = self.source_rates.get(key, SOURCE_RATE_PER_MINUTE)
+            bucket = self.source_buckets[key] = TokenBucket(rate / 60 / WEB_CONCURRENCY, SOURCE_BURST)
+        return bucket
+
+    def try_admit(self, lead_data, targets=None):
+        """Take a token from the source bucket and one per target from its org, or none at all"""
+        targets = targets or lead_router.targets(lead_data)
+        with self.lock:
+            needed = {}
+            source_bucket = self._source_bucket(lead_data.get("Campaign_Source"))
+            needed[id(source_bucket)] = (source_bucket, 1)
+            for target in targets:
+                bucket, count = needed.get(id(target.org.bucket), (target.org.bucket, 0))
+                needed[id(bucket)] = (bucket, count + 1)
+            
+            for bucket, count in needed.values():
+                bucket.refill()
+                if bucket.tokens < count:
+                    return False
+            for bucket, count in needed.values():
+                bucket.tokens -= count
+            return True
+
+    def admit(self, lead_data, targets=None, heartbeat=None, heartbeat_interval=30):
+        """Wait until try_admit() succeeds, for bulk jobs that share the webhook's budget.
+
+        heartbeat, when given, is called every heartbeat_interval seconds
+        while waiting, so a job held up by the budget still shows progress.
+        """
+        last_beat = time.monotonic()
+        while not self.try_admit(lead_data, targets):
+            if heartbeat and time.monotonic() - last_beat >= heartbeat_interval:
+                heartbeat()
+                last_beat = time.monotonic()
+            time.sleep(ADMISSION_POLL_SECONDS)
+
+    def state(self):
+        with self.lock:
+            return {
+                "orgs": {name: org.bucket.state() for name, org in sorted(salesforce_orgs.items())},
+                "sources": {source: bucket.state() for source, bucket in sorted(self.source_buckets.items())}
+            }
+
+admission = AdmissionController()
+
+class DeferredLeadQueue:
+    """Durable FIFO of leads waiting for admission, drained in the background.
+
+    Leads are appended as JSON lines and a cursor file records how far delivery
+    has got, so nothing is lost if a worker restarts mid-drain. An exclusive
+    lock on the queue makes sure only one worker drains at a time. Lines that
+    aren't a JSON lead are moved to a dead-letter file and skipped.
+
+    The draining worker admits leads through its own buckets, i.e. its
+    1/WEB_CONCURRENCY share of the API budget, because the other workers may
+    be spending their shares on webhooks at the same time; a backlog drains at
+    that share on top of whatever the draining worker's own webhooks leave.
+    """
+
+    def __init__(self, path, interval=1.0):
+        self.path = path
+        self.dead_letter_path = path + ".dead"
+        self.cursor_path = path + ".cursor"
+        self.lock_path = path + ".lock"
+        self.drain_lock_path = path + ".drain.lock"
+        self.interval = interval
+        self.wakeup = threading.Event()
+        self.thread = None
+        self.thread_lock = threading.Lock()
+
+    def push(self, lead_data):
+        with open(self.lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(lead_data, ensure_ascii=False) + "\n")
+        self.start()
+        self.wakeup.set()
+
+    def _read_cursor(self):
+        try:
+            with open(self.cursor_path) as f:
+                return int(f.read().strip() or 0)
+        except (FileNotFoundError, ValueError):
+            return 0
+
+    def _write_cursor(self, offset):
+        temp_path = self.cursor_path + ".tmp"
+        with open(temp_path, "w") as f:
+            f.write(str(offset))
+        os.replace(temp_path, self.cursor_path)
+
+    def depth(self):
+        """Number of leads still waiting"""
+        if not os.path.exists(self.path):
+            return 0
+        with open(self.path, "rb") as f:
+            f.seek(self._read_cursor())
+            return f.read().count(b"\n")
+
+    def _parse(self, line):
+        try:
+            lead_data = json.loads(line)
+        except ValueError:
+            return None
+        return lead_data if isinstance(lead_data, dict) else None
+
+    def _dead_letter(self, line):
+        """Set aside a line that can't be delivered so the queue moves past it"""
+        with open(self.dead_letter_path, "ab") as f:
+            f.write(line)
+        print(f"Moved an unreadable deferred lead to {self.dead_letter_path}")
+
+    def drain(self):
+        """Deliver queued leads in order for as long as the buckets allow"""
+        with open(self.drain_lock_path, "a") as drain_lock:
+            try:
+                fcntl.flock(drain_lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return  # Another worker is draining
+            if not os.path.exists(self.path):
+                return
+            
+            offset = self._read_cursor()
+            with open(self.path, "rb") as f:
+                f.seek(offset)
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break
+                    if line.strip():
+                        lead_data = self._parse(line)
+                        if lead_data is None:
+                            self._dead_letter(line)
+                        else:
+                            if not admission.try_admit(lead_data):
+                                break
+                            deliver_lead(lead_data)
+                    offset += len(line)
+                    self._write_cursor(offset)
+            
+            # Compact once everything has been delivered, unless a push just landed
+            with open(self.lock_path, "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                if offset >= os.path.getsize(self.path):
+                    os.remove(self.path)
+                    if os.path.exists(self.cursor_path):
+                        os.remove(self.cursor_path)
+
+    def start(self):
+        """Start the background drainer for this worker if it isn't running"""
+        with self.thread_lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="deferred-leads", daemon=True)
+                self.thread.start()
+
+    def _run(self):
+        while True:
+            self.wakeup.wait(self.interval)
+            self.wakeup.clear()
+            try:
+                self.drain()
+            except Exception as e:
+                print(f"Deferred lead drain failed: {str(e)}")
+
+deferred_leads = DeferredLeadQueue(DEFERRED_LEADS_FILE)
+
+def row_fingerprints(df):
+    """Stable id per row: a hash of its values plus which repeat of that row it is.
+
+    Unlike positions, these survive other rows being removed from the log.
+    Read the log with dtype=str and keep_default_na=False before hashing.
+    """
+    seen = {}
+    for values in df.itertuples(index=False, name=None):
+        digest = hashlib.sha1("\x1f".join(values).encode("utf-8")).hexdigest()
+        seen[digest] = seen.get(digest, 0) + 1
+        yield f"{digest}#{seen[digest]}"
+
+# Progress of background jobs, one JSON file each so any worker can report it
+JOBS_DIR = "jobs"
+JOB_DETAIL_LIMIT = 1000
+
+class BackgroundJob:
+    """A bulk operation running on a worker thread with its progress saved to disk.
+
+    The runner calls record() per lead and checkpoint() once the results so far
+    have been written back to the lead logs, so the saved progress never runs
+    ahead of what has actually been committed. In between, record() re-saves
+    the last committed progress every HEARTBEAT_SECONDS, so a job spacing its
+    commits out further than JOB_STALL_SECONDS isn't reported as stalled.
+
+    Writing results back rewrites a whole log, and every worker then re-reads
+    it for its search index and rollups, so commits are spaced out by time:
+    at least COMMIT_SECONDS apart and at least COMMIT_COST_RATIO times as
+    long as the previous commit took, with COMMIT_EVERY leads at most in
+    between so a killed worker can't lose more than that.
+    """
+
+    COMMIT_EVERY = 1000
+    COMMIT_SECONDS = 10
+    COMMIT_COST_RATIO = 10
+    HEARTBEAT_SECONDS = 5
+
+    def __init__(self, kind, total):
+        self.state = {
+            "id": uuid.uuid4().hex[:12],
+            "kind": kind,
+            "status": "running",
+            "total": total,
+            "success": 0,
+            "failure": 0,
+            "details": [],
+            "error": None,
+            "started": time.time(),
+            "updated": time.time(),
+            "alive": time.time(),
+            "finished": None
+        }
+        self.handled = 0
+        self.last_commit = time.monotonic()
+        self.commit_started = None
+        self.commit_cost = 0
+        self.uncommitted = 0
+        self.saved = None
+        self.last_save = time.monotonic()
+
+    @property
+    def id(self):
+        return self.state["id"]
+
+    def record(self, ok, detail=None):
+        self.state["success" if ok else "failure"] += 1
+        if detail and len(self.state["details"]) < JOB_DETAIL_LIMIT:
+            self.state["details"].append(detail)
+        self.uncommitted += 1
+        self.heartbeat()
+
+    def commit_due(self):
+        """Whether the runner should write its results back now; it then calls checkpoint()"""
+        interval = max(self.COMMIT_SECONDS, self.COMMIT_COST_RATIO * self.commit_cost)
+        due = self.uncommitted >= self.COMMIT_EVERY or time.monotonic() - self.last_commit >= interval
+        if due:
+            self.commit_started = time.monotonic()
+        return due
+
+    def checkpoint(self):
+        now = time.monotonic()
+        if self.commit_started is not None:
+            self.commit_cost = now - self.commit_started
+            self.commit_started = None
+        self.uncommitted = 0
+        self.last_commit = now
+        self.save()
+
+    def save(self):
+        """Save the progress so far as committed"""
+        self.state["updated"] = time.time()
+        self.saved = dict(self.state, details=list(self.state["details"]))
+        self.write(self.saved)
+
+    def heartbeat(self):
+        """Re-save the last committed progress if it hasn't been saved for a while"""
+        if self.saved is not None and time.monotonic() - self.last_save >= self.HEARTBEAT_SECONDS:
+            self.write(self.saved)
+
+    def write(self, state):
+        state["alive"] = time.time()
+        self.last_save = time.monotonic()
+        os.makedirs(JOBS_DIR, exist_ok=True)
+        path = os.path.join(JOBS_DIR, f"{self.id}.json")
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump(state, f)
+        os.replace(temp_path, path)
+
+def start_job(kind, total, runner):
+    """Run runner(job) on a background thread and return the job straight away"""
+    job = BackgroundJob(kind, total)
+    job.save()
+    
+    def run():
+        try:
+            runner(job)
+            job.state["status"] = "done"
         except Exception as e:
-            log_failed_lead(data, 500, str(e))
-            return redirect(url_for("index"))
+            job.state["status"] = "failed"
+            job.state["error"] = str(e)
+        job.state["finished"] = time.time()
+        job.save()
+    
+    threading.Thread(target=run, name=f"job-{job.id}", daemon=True).start()
+    return job
+
+# A running job that hasn't saved progress or a heartbeat for this long has lost its worker
+JOB_STALL_SECONDS = 120
+
+def load_job(job_id):
+    """Read a job's saved progress and work out what's left, or None if unknown"""
+    if not re.fullmatch(r"[0-9a-f]{12}", job_id):
+        return None
+    try:
+        with open(os.path.join(JOBS_DIR, f"{job_id}.json")) as f:
+            job = json.load(f)
+    except FileNotFoundError:
+        return None
+    
+    handled = job["success"] + job["failure"]
+    job["done"] = handled
+    job["remaining"] = job["total"] - handled
+    job["eta_seconds"] = None
+    if job["status"] == "running":
+        if time.time() - job["alive"] > JOB_STALL_SECONDS:
+            job["status"] = "stalled"
+        elif handled:
+            rate = handled / max(job["updated"] - job["started"], 0.001)
+            job["eta_seconds"] = round(job["remaining"] / rate, 1)
+    return job
+
+# Expensive admin and dashboard views allowed to run at once in each worker,
+# so exports and big pages can't take every thread away from /webhook (0 = no cap)
+ADMIN_CONCURRENCY = int(os.getenv("ADMIN_CONCURRENCY", "2"))
+ADMIN_QUEUE_TIMEOUT = float(os.getenv("ADMIN_QUEUE_TIMEOUT", "20"))
+# Admin requests allowed to wait for a slot; each holds a request thread, so by
+# default they get whatever streams, running views and ingestion leave over
+ADMIN_MAX_WAITING = int(os.getenv("ADMIN_MAX_WAITING", str(max(
+    0, GUNICORN_THREADS - INGEST_RESERVED_THREADS - LIVE_STREAM_LIMIT - ADMIN_CONCURRENCY))))
+# How much lower than ingestion the admin threads run in the OS scheduler (0-19)
+ADMIN_NICE = int(os.getenv("ADMIN_NICE", "10"))
+
+def lower_thread_priority():
+    """Renice the calling thread so the kernel schedules ingestion threads first"""
+    if ADMIN_NICE and sys.platform.startswith("linux"):
+        try:
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), ADMIN_NICE)
+        except OSError:
+            pass
+
+class ConcurrencyGate:
+    """Run a group of views on their own small, low-priority thread pool.
+
+    At most limit of them run at once in this worker. Up to max_waiting
+    requests over the cap wait up to timeout seconds for a slot; the rest, and
+    any that time out, get a 503 with Retry-After at once rather than piling
+    up on the threads /webhook needs. The views run on
+    reniced threads, so while they crunch CSVs the kernel still schedules
+    lead ingestion (in this worker and the others) ahead of them.
+    """
+
+    def __init__(self, limit, timeout, max_waiting):
+        self.limit = limit
+        self.timeout = timeout
+        self.max_waiting = max_waiting
+        self.slots = threading.BoundedSemaphore(limit) if limit > 0 else None
+        self.pool = None
+        self.lock = threading.Lock()
+        self.running = 0
+        self.waiting = 0
+        self.rejected = 0
+
+    def __call__(self, view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if self.slots is None:
+                return view(*args, **kwargs)
+            
+            acquired = self.slots.acquire(blocking=False)
+            if not acquired:
+                with self.lock:
+                    queued = self.waiting < self.max_waiting
+                    if queued:
+                        self.waiting += 1
+                if queued:
+                    acquired = self.slots.acquire(timeout=self.timeout)
+                    with self.lock:
+                        self.waiting -= 1
+            with self.lock:
+                if acquired:
+                    self.running += 1
+                else:
+                    self.rejected += 1
+            if not acquired:
+                response = jsonify({"error": "Server busy with other reports, try again shortly"})
+                response.status_code = 503
+                response.headers["Retry-After"] = "5"
+                return response
+            
+            try:
+                with self.lock:
+                    if self.pool is None:
+                        # Created lazily so each gunicorn worker gets its own threads
+                        self.pool = ThreadPoolExecutor(self.limit, thread_name_prefix="admin",
+                                                       initializer=lower_thread_priority)
+                view_in_pool = copy_current_request_context(profiled_in_thread(view))
+                return self.pool.submit(view_in_pool, *args, **kwargs).result()
+            finally:
+                with self.lock:
+                    self.running -= 1
+                self.slots.release()
+        return wrapper
+
+    def state(self):
+        with self.lock:
+            return {
+                "limit": self.limit,
+                "running": self.running,
+                "waiting": self.waiting,
+                "max_waiting": self.max_waiting,
+                "rejected": self.rejected
+            }
+
+admin_gate = ConcurrencyGate(ADMIN_CONCURRENCY, ADMIN_QUEUE_TIMEOUT, ADMIN_MAX_WAITING)
+
+@app.before_request
+def start_deferred_lead_drainer():
+    """Make sure leads queued by an earlier process get delivered"""
+    if deferred_leads.thread is None and os.path.exists(DEFERRED_LEADS_FILE):
+        deferred_leads.start()
+
+@app.route("/form", methods=["GET", "POST"])
+def form():
+    """Handle test lead submission form"""
+    if request.method == "POST":
+        data = new_lead(
+            request.form["firstname"],
+            request.form["lastname"],
+            request.form["mobile"],
+            request.form["email"],
+            request.form["source"],
+            request.form["campaign"]
+        )
+        cleaned, errors = validate_lead(data)
+        if errors:
+            log_invalid_lead(data, errors)
+            return render_template("form.html", title="Submit a Test Lead", errors=errors), 400
+        data = cleaned
+        # Outcomes are logged per target and shown on the dashboard
+        deliver_lead(data)
+        return redirect(url_for("index"))
             
     return render_template("form.html", title="Submit a Test Lead")
 
@@ -152,13 +1943,11 @@ def form():
 def webhook():
     """Handle incoming webhook from TikTok/Snapchat"""
     try:
-        data = request.json.copy()  # Create a copy to modify safely
-        
-        # Validate required fields
-        required_fields = ["Firstname", "Lastname", "Mobile", "Email"]
-        for field in required_fields:
-            if field not in data:
-                return jsonify({"error": f"Missing required field: {field}"}), 400
+        # Validate and normalize a copy before spending any Salesforce quota
+        data, errors = validate_lead(request.json)
+        if errors:
+            log_invalid_lead(request.json, errors)
+            return jsonify({"error": "; ".join(errors)}), 400
         
         # Process purchase timeframe if it's in Arabic
         purchase_time_frame = "More than 3 months"
@@ -171,42 +1960,41 @@ def webhook():
             # Remove the old field to prevent duplication
             del data["Purchase_TimeFrame"]
         
-        # Add default fields
-        lead_data = {
-            "Enquiry_Type": "Book_a_Test_Drive",
-            "DealerCode": "PTC",
-            "Shrm_SvCtr": "PETROMIN Jubail",
-            "Make": "Jeep",
-            "Line": "Wrangler",
-            "Entry_Form": "EN",
-            "Market": "Saudi Arabia",
-            "Campaign_Medium": "Boopin",
-            "TestDriveType": "In Showroom",
-            "Extended_Privacy": "true",
-            "Purchase_Time_Frame": purchase_time_frame,  # Set the correct field here
-            "Marketing_Communication_Consent": "1",
-            "Fund": "DD",
-            "FormCode": "PET_Q2_25",
-            "Request_Origin": "https://www.jeep-saudi.com",
-            "MasterKey": "Jeep_EN_GENERIC_RI:RP:TD_0_8_1_6_50_42"
-        }
-        
-        # Update with incoming data
+        # Standard dealer fields first, then whatever the platform sent
+        lead_data = new_lead(
+            data.get("Firstname", ""),
+            data.get("Lastname", ""),
+            data.get("Mobile", ""),
+            data.get("Email", ""),
+            data.get("Campaign_Source", ""),
+            data.get("Campaign_Name", ""),
+            purchase_time_frame
+        )
         lead_data.update(data)
         
         # Ensure Source_Site is set correctly
-        if "Campaign_Source" in data:
+        if data.get("Campaign_Source"):
             lead_data["Source_Site"] = data["Campaign_Source"].lower() + " Ads"
+        
+        live_events.publish("lead-accepted", {
+            "log": "webhook",
+            "name": f"{lead_data['Firstname']} {lead_data['Lastname']}".strip(),
+            "source": lead_data.get("Campaign_Source", ""),
+            "campaign": lead_data.get("Campaign_Name", "")
+        })
             
-        # Send to Salesforce
-        token = get_salesforce_token()
-        status, response = send_to_salesforce(token, lead_data)
+        # Over budget leads wait in the deferred queue instead of hitting Salesforce limits
+        targets = lead_router.targets(lead_data)
+        if not admission.try_admit(lead_data, targets):
+            deferred_leads.push(lead_data)
+            return jsonify({"success": True, "queued": True, "message": "Lead accepted and queued for delivery"}), 202
+        
+        # Send to every org the lead's route names
+        status, response = delivery_outcome(deliver_lead(lead_data, targets))
         
         if 200 <= status < 300:
-            log_lead(lead_data, status)
             return jsonify({"success": True, "message": "Lead created successfully"}), 200
         else:
-            log_failed_lead(lead_data, status, response)
             return jsonify({"success": False, "error": response}), status
             
     except Exception as e:
@@ -219,32 +2007,6 @@ def google_webhook():
         data = request.json
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         
-        # Ensure the file exists with headers
-        if not os.path.exists("google_leads.csv"):
-            with open("google_leads.csv", "w", newline="") as f:
-                writer = csv.writer(f)
-                writer.writerow(["Timestamp", "FirstName", "LastName", "Email", "Phone", 
-                                "CampaignID", "CampaignName", "AdGroupID", "AdGroupName",
-                                "SentToSalesforce", "SalesforceStatus", "LastSentTimestamp"])
-        
-        # Write the lead data
-        with open("google_leads.csv", "a", newline="") as f:
-            writer = csv.writer(f)
-            writer.writerow([
-                timestamp,
-                data.get("firstName", ""),
-                data.get("lastName", ""),
-                data.get("email", ""),
-                data.get("phone", ""),
-                data.get("campaignId", ""),
-                data.get("campaignName", ""),
-                data.get("adGroupId", ""),
-                data.get("adGroupName", ""),
-                False,
-                "",
-                ""
-            ])
-            
         # Process purchase timeframe if it's in incoming data
         purchase_time_frame = "More than 3 months"
         if "Purchase_Time_Frame" in data and data["Purchase_Time_Frame"]:
@@ -253,34 +2015,59 @@ def google_webhook():
             purchase_time_frame = get_purchase_timeframe(data["Purchase_TimeFrame"])
             
         # Build the lead data with only the correct field
-        lead_data = {
-            "Enquiry_Type": "Book_a_Test_Drive",
-            "Firstname": data.get("firstName", ""),
-            "Lastname": data.get("lastName", ""),
-            "Mobile": data.get("phone", ""),
-            "Email": data.get("email", ""),
-            "DealerCode": "PTC",
-            "Shrm_SvCtr": "PETROMIN Jubail",
-            "Make": "Jeep",
-            "Line": "Wrangler",
-            "Entry_Form": "EN",
-            "Market": "Saudi Arabia",
-            "Campaign_Source": "Google",
-            "Campaign_Name": data.get("campaignName", "Google Ads"),
-            "Campaign_Medium": "Boopin",
-            "TestDriveType": "In Showroom",
-            "Extended_Privacy": "true",
-            "Purchase_Time_Frame": purchase_time_frame,  # Only use the correct field
-            "Source_Site": "google ads",
-            "Marketing_Communication_Consent": "1",
-            "Fund": "DD",
-            "FormCode": "PET_Q2_25",
-            "Request_Origin": "https://www.jeep-saudi.com",
-            "MasterKey": "Jeep_EN_GENERIC_RI:RP:TD_0_8_1_6_50_42"
-        }
+        lead_data = new_lead(
+            data.get("firstName", ""),
+            data.get("lastName", ""),
+            data.get("phone", ""),
+            data.get("email", ""),
+            "Google",
+            data.get("campaignName", "Google Ads"),
+            purchase_time_frame,
+            source_site="google ads"
+        )
+        lead_data, errors = validate_lead(lead_data)
         
-        token = get_salesforce_token()
-        send_to_salesforce(token, lead_data)
+        with log_lock("google"):
+            # Ensure the file exists with headers
+            if not os.path.exists("google_leads.csv"):
+                with open("google_leads.csv", "w", newline="") as f:
+                    writer = csv.writer(f)
+                    writer.writerow(["Timestamp", "FirstName", "LastName", "Email", "Phone", 
+                                    "CampaignID", "CampaignName", "AdGroupID", "AdGroupName",
+                                    "SentToSalesforce", "SalesforceStatus", "LastSentTimestamp"])
+            
+            # Write the lead data as received; invalid ones are marked so they
+            # can be fixed and resent from the Google leads page
+            with open("google_leads.csv", "a", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow([
+                    timestamp,
+                    data.get("firstName", ""),
+                    data.get("lastName", ""),
+                    data.get("email", ""),
+                    data.get("phone", ""),
+                    data.get("campaignId", ""),
+                    data.get("campaignName", ""),
+                    data.get("adGroupId", ""),
+                    data.get("adGroupName", ""),
+                    False,
+                    "Invalid" if errors else "",
+                    ""
+                ])
+        note_log_write("google")
+        
+        # The lead is saved, so Google gets a 200 either way; answering with an
+        # error would only make it report a failure or send the lead again
+        if errors:
+            return jsonify({"success": True, "sent": False, "errors": errors,
+                            "message": "Google lead saved but not sent to Salesforce"}), 200
+        
+        targets = lead_router.targets(lead_data)
+        if not admission.try_admit(lead_data, targets):
+            deferred_leads.push(lead_data)
+            return jsonify({"success": True, "queued": True, "message": "Google lead saved and queued for delivery"}), 202
+        
+        deliver_lead(lead_data, targets)
             
         return jsonify({"success": True, "message": "Google lead saved successfully"}), 200
             
@@ -288,6 +2075,9 @@ def google_webhook():
         return jsonify({"error": str(e)}), 500
 
 @app.route("/google-leads")
+@conditional_on_logs("google", daily=True)
+@cached_output("google", daily=True)
+@admin_gate
 def google_leads():
     """Display Google Ads leads with enhanced features"""
     if not os.path.exists("google_leads.csv"):
@@ -301,7 +2091,7 @@ def google_leads():
         )
     
     # Read the data
-    df = pd.read_csv("google_leads.csv")
+    df = load_log("google")
     
     # Calculate some stats first
     total_leads = len(df)
@@ -310,8 +2100,8 @@ def google_leads():
     df["Timestamp"] = pd.to_datetime(df["Timestamp"], errors="coerce")
     
     # Calculate today's leads
-    today = pd.Timestamp.now().date()
-    today_leads = len(df[df["Timestamp"].dt.date == today])
+    today = datetime.now().strftime("%Y-%m-%d")
+    today_leads = sum(b["count"] for b in query_rollups(["google"], grain="all", start=today, end=today))
     
     # Last lead time - use the user-friendly format
     if not df.empty:
@@ -319,12 +2109,15 @@ def google_leads():
     else:
         last_lead_time = None
         
+    # Campaign totals, busiest first
+    campaign_totals = sorted(
+        (b for b in query_rollups(["google"], grain="all", group=["campaign"]) if b["campaign"]),
+        key=lambda b: b["count"],
+        reverse=True
+    )
+    
     # Top campaign
-    if not df.empty and "CampaignName" in df.columns:
-        campaign_counts = df["CampaignName"].value_counts()
-        top_campaign = campaign_counts.index[0] if not campaign_counts.empty else None
-    else:
-        top_campaign = None
+    top_campaign = campaign_totals[0]["campaign"] if campaign_totals else None
     
     # Apply filters if provided
     campaign_filter = request.args.get("campaign")
@@ -347,12 +2140,7 @@ def google_leads():
     
     # Apply search filter
     if search_filter:
-        search_condition = (
-            filtered_df["FirstName"].str.contains(search_filter, na=False, case=False) | 
-            filtered_df["LastName"].str.contains(search_filter, na=False, case=False) | 
-            filtered_df["Email"].str.contains(search_filter, na=False, case=False)
-        )
-        filtered_df = filtered_df[search_condition]
+        filtered_df = filtered_df[filtered_df.index.isin(search_leads("google", search_filter))]
     
     # Apply sorting
     if sort_option == "newest":
@@ -368,11 +2156,10 @@ def google_leads():
     filtered_count = len(filtered_df)
     
     # Campaign performance data for chart
-    if not df.empty and "CampaignName" in df.columns:
-        campaign_counts = df["CampaignName"].value_counts().head(10)
+    if campaign_totals:
         campaign_data = {
-            "labels": campaign_counts.index.tolist(),
-            "values": campaign_counts.values.tolist()
+            "labels": [b["campaign"] for b in campaign_totals[:10]],
+            "values": [b["count"] for b in campaign_totals[:10]]
         }
     else:
         campaign_data = None
@@ -433,9 +2220,65 @@ def google_leads():
         pages=total_pages
     )
 
+def commit_google_statuses(updates):
+    """Write SentToSalesforce/SalesforceStatus/LastSentTimestamp for rows by position"""
+    with log_lock("google"):
+        df = load_log("google", raw=True)
+        for column in ("SentToSalesforce", "SalesforceStatus", "LastSentTimestamp"):
+            if column not in df.columns:
+                df[column] = ""
+        for index, values in updates.items():
+            for column, value in values.items():
+                df.loc[index, column] = str(value)
+        rewrite_log(df, "google")
+
+def run_google_send(job, rows, mark_sent, log_results):
+    """Send Google leads, saving their status back to google_leads.csv as it goes"""
+    updates = {}
+    for index, lead_data in rows:
+        try:
+            # Don't spend API quota on leads Salesforce would reject
+            lead_data, errors = validate_lead(lead_data)
+            if errors:
+                job.record(False, {"id": int(index), "status": "Invalid", "message": "; ".join(errors)})
+                if log_results:
+                    print(f"Skipping invalid lead {lead_data.get('Email')}: {'; '.join(errors)}")
+            else:
+                # Bulk sends spend the same API budget as the webhooks
+                targets = lead_router.targets(lead_data)
+                admission.admit(lead_data, targets, heartbeat=job.heartbeat)
+                # Each target's outcome is logged by deliver_lead
+                status, response = delivery_outcome(deliver_lead(lead_data, targets))
+                sent_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                
+                if 200 <= status < 300:
+                    job.record(True)
+                    if mark_sent:
+                        updates[index] = {"SentToSalesforce": True, "SalesforceStatus": status, "LastSentTimestamp": sent_at}
+                else:
+                    job.record(False, {"id": int(index), "status": "Failed", "message": f"Status: {status}, Response: {response}"})
+                    if mark_sent:
+                        updates[index] = {"SalesforceStatus": status, "LastSentTimestamp": sent_at}
+                    
+        except Exception as e:
+            job.record(False, {"id": int(index), "status": "Error", "message": str(e)})
+            if log_results:
+                print(f"Error sending lead {lead_data.get('Email')}: {str(e)}")
+        
+        # Save statuses in batches so a killed worker loses at most one batch
+        if job.commit_due():
+            if updates:
+                commit_google_statuses(updates)
+                updates = {}
+            job.checkpoint()
+    
+    if updates:
+        commit_google_statuses(updates)
+
 @app.route("/api/send-google-leads-to-salesforce", methods=["POST"])
+@admin_gate
 def send_google_leads_to_salesforce():
-    """API endpoint to send Google leads to Salesforce"""
+    """API endpoint to send Google leads to Salesforce as a background job"""
     if not os.path.exists("google_leads.csv"):
         return jsonify({"error": "No Google leads found"}), 404
     
@@ -446,16 +2289,13 @@ def send_google_leads_to_salesforce():
     filters = data.get("filters", {})
     
     # Read Google leads
-    df = pd.read_csv("google_leads.csv")
+    df = load_log("google", raw=True)
     df["Timestamp"] = pd.to_datetime(df["Timestamp"], errors="coerce")
     
     # Ensure status columns exist
-    if "SentToSalesforce" not in df.columns:
-        df["SentToSalesforce"] = False
-    if "SalesforceStatus" not in df.columns:
-        df["SalesforceStatus"] = None
-    if "LastSentTimestamp" not in df.columns:
-        df["LastSentTimestamp"] = None
+    for column in ("SentToSalesforce", "SalesforceStatus", "LastSentTimestamp"):
+        if column not in df.columns:
+            df[column] = ""
     
     # Apply the same filters as in the view
     if filters.get("campaign"):
@@ -466,105 +2306,29 @@ def send_google_leads_to_salesforce():
         df = df[df["Timestamp"].dt.date == filter_date]
     
     if filters.get("search"):
-        search = filters["search"]
-        search_condition = (
-            df["FirstName"].str.contains(search, na=False, case=False) | 
-            df["LastName"].str.contains(search, na=False, case=False) | 
-            df["Email"].str.contains(search, na=False, case=False)
-        )
-        df = df[search_condition]
+        df = df[df.index.isin(search_leads("google", filters["search"]))]
     
     # Further filter based on selection
     if selection == "unsent":
-        df = df[~df["SentToSalesforce"].fillna(False)]
+        df = df[df["SentToSalesforce"].str.lower() != "true"]
     elif selection == "failed":
-        df = df[(df["SalesforceStatus"] != 200) & (df["SalesforceStatus"].notna())]
-    
-    # Process results
-    results = {"success": 0, "failure": 0, "details": []}
-    
-    # Create a copy for updating status
-    original_df = pd.read_csv("google_leads.csv")
+        status = pd.to_numeric(df["SalesforceStatus"], errors="coerce")
+        df = df[(status != 200) & status.notna()]
     
-    # Ensure status columns exist in original DF too
-    if "SentToSalesforce" not in original_df.columns:
-        original_df["SentToSalesforce"] = False
-    if "SalesforceStatus" not in original_df.columns:
-        original_df["SalesforceStatus"] = None
-    if "LastSentTimestamp" not in original_df.columns:
-        original_df["LastSentTimestamp"] = None
-    
-    # Process each lead
-    for index, row in df.iterrows():
-        try:
-            lead_data = {
-                "Enquiry_Type": "Book_a_Test_Drive",
-                "Firstname": row.get("FirstName", ""),
-                "Lastname": row.get("LastName", ""),
-                "Mobile": row.get("Phone", ""),
-                "Email": row.get("Email", ""),
-                "DealerCode": "PTC",
-                "Shrm_SvCtr": "PETROMIN Jubail",
-                "Make": "Jeep",
-                "Line": "Wrangler",
-                "Entry_Form": "EN",
-                "Market": "Saudi Arabia",
-                "Campaign_Source": "Google",
-                "Campaign_Name": row.get("CampaignName", "Google Ads"),
-                "Campaign_Medium": "Boopin",
-                "TestDriveType": "In Showroom",
-                "Extended_Privacy": "true",
-                "Purchase_Time_Frame": "More than 3 months",  # Only use the correct field
-                "Source_Site": "google ads",
-                "Marketing_Communication_Consent": "1",
-                "Fund": "DD",
-                "FormCode": "PET_Q2_25",
-                "Request_Origin": "https://www.jeep-saudi.com",
-                "MasterKey": "Jeep_EN_GENERIC_RI:RP:TD_0_8_1_6_50_42"
-            }
-            
-            token = get_salesforce_token()
-            status, response = send_to_salesforce(token, lead_data)
-            
-            if 200 <= status < 300:
-                # Log successful lead
-                log_lead(lead_data, status)
-                results["success"] += 1
-                
-                # Update original dataframe if marking as sent
-                if mark_sent:
-                    original_df.loc[index, "SentToSalesforce"] = True
-                    original_df.loc[index, "SalesforceStatus"] = status
-                    original_df.loc[index, "LastSentTimestamp"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            else:
-                # Log failed lead
-                log_failed_lead(lead_data, status, response)
-                results["failure"] += 1
-                
-                # Update original dataframe
-                if mark_sent:
-                    original_df.loc[index, "SalesforceStatus"] = status
-                    original_df.loc[index, "LastSentTimestamp"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                
-        except Exception as e:
-            results["failure"] += 1
-            if log_results:
-                print(f"Error sending lead {row.get('Email')}: {str(e)}")
-    
-    # Save updated status
-    if mark_sent:
-        original_df.to_csv("google_leads.csv", index=False)
-    
-    return jsonify(results)
+    rows = [(index, lead_from_log_row("google", row)) for index, row in df.iterrows()]
+    job = start_job("google-send", len(rows), lambda job: run_google_send(job, rows, mark_sent, log_results))
+    return jsonify({"job_id": job.id, "total": len(rows)}), 202
 
 @app.route("/download-google-leads")
+@cached_output("google", daily=True)
+@admin_gate
 def download_google_leads():
     """Download Google leads as CSV"""
     if not os.path.exists("google_leads.csv"):
         return "No Google Ads leads found.", 404
     
     # Apply filters if provided
-    df = pd.read_csv("google_leads.csv")
+    df = load_log("google")
     
     campaign_filter = request.args.get("campaign")
     date_filter = request.args.get("date")
@@ -584,12 +2348,7 @@ def download_google_leads():
     
     # Apply search filter
     if search_filter:
-        search_condition = (
-            df["FirstName"].str.contains(search_filter, na=False, case=False) | 
-            df["LastName"].str.contains(search_filter, na=False, case=False) | 
-            df["Email"].str.contains(search_filter, na=False, case=False)
-        )
-        df = df[search_condition]
+        df = df[df.index.isin(search_leads("google", search_filter))]
     
     # Convert back timestamp for CSV
     df["Timestamp"] = df["Timestamp"].dt.strftime("%Y-%m-%d %H:%M:%S")
@@ -613,13 +2372,15 @@ def download_google_leads():
     )
 
 @app.route("/export-google-excel")
+@cached_output("google", daily=True)
+@admin_gate
 def export_google_excel():
     """Export Google leads as Excel"""
     if not os.path.exists("google_leads.csv"):
         return "No Google Ads leads found.", 404
         
     # Apply filters if provided
-    df = pd.read_csv("google_leads.csv")
+    df = load_log("google")
     
     campaign_filter = request.args.get("campaign")
     date_filter = request.args.get("date")
@@ -639,12 +2400,7 @@ def export_google_excel():
     
     # Apply search filter
     if search_filter:
-        search_condition = (
-            df["FirstName"].str.contains(search_filter, na=False, case=False) | 
-            df["LastName"].str.contains(search_filter, na=False, case=False) | 
-            df["Email"].str.contains(search_filter, na=False, case=False)
-        )
-        df = df[search_condition]
+        df = df[df.index.isin(search_leads("google", search_filter))]
     
     # Format timestamps for Excel in user-friendly format
     df["Timestamp"] = df["Timestamp"].apply(format_timestamp_for_display)
@@ -676,12 +2432,15 @@ def export_google_excel():
     )
 
 @app.route("/logs")
+@conditional_on_logs("leads")
+@cached_output("leads")
+@admin_gate
 def logs():
     """Display lead logs with filtering"""
     if not os.path.exists("leads.csv"):
         return render_template("logs.html", title="Lead Logs", no_data=True)
         
-    df = pd.read_csv("leads.csv")
+    df = load_log("leads")
     
     # Get unique campaigns and sources for filtering
     campaigns = df["Campaign_Name"].dropna().unique().tolist() if "Campaign_Name" in df.columns else []
@@ -691,6 +2450,7 @@ def logs():
     selected = request.args.get("campaign")
     selected_source = request.args.get("source")
     from_date = request.args.get("from_date")
+    search_filter = request.args.get("search")
     
     if selected and "Campaign_Name" in df.columns:
         df = df[df["Campaign_Name"] == selected]
@@ -698,6 +2458,9 @@ def logs():
     if selected_source and "Campaign_Source" in df.columns:
         df = df[df["Campaign_Source"] == selected_source]
         
+    if search_filter:
+        df = df[df.index.isin(search_leads("leads", search_filter))]
+        
     if from_date and "Timestamp" in df.columns:
         df["Timestamp"] = pd.to_datetime(df["Timestamp"], errors="coerce")
         df = df[df["Timestamp"].dt.date >= pd.to_datetime(from_date).date()]
@@ -716,16 +2479,20 @@ def logs():
         sources=sources,
         selected=selected,
         selected_source=selected_source,
-        from_date=from_date
+        from_date=from_date,
+        search=search_filter
     )
 
 @app.route("/failed-logs", methods=["GET"])
+@conditional_on_logs("failed")
+@cached_output("failed")
+@admin_gate
 def failed_logs():
     """Display failed lead logs with filtering and retry options"""
     if not os.path.exists("failed_leads.csv"):
         return render_template("failed_logs.html", title="Failed Leads Log", no_data=True)
         
-    df = pd.read_csv("failed_leads.csv")
+    df = load_log("failed")
     
    # Format timestamps in user-friendly way
     if "Timestamp" in df.columns:
@@ -750,12 +2517,15 @@ def failed_logs():
     df = df.reset_index().rename(columns={"index": "ID"})
     
     # Group errors by type and count for chart
-    error_counts = df["Error"].value_counts().to_dict()
+    error_counts = df["Error"].value_counts()
+    error_counts = error_counts[error_counts > 0].to_dict()
     
     # Analyze common error patterns
     error_analysis = {}
     for error in error_types:
-        if "INVALID" in error:
+        if error == "Validation Error":
+            error_analysis[error] = "Refused before sending. Correct the fields named in the response, then retry."
+        elif "INVALID" in error:
             error_analysis[error] = "Data validation error. Check the lead information for formatting issues."
         elif "AUTH" in error or "TOKEN" in error:
             error_analysis[error] = "Authentication failure. Verify Salesforce credentials."
@@ -792,12 +2562,7 @@ def download_log():
     if not os.path.exists("leads.csv"):
         return "No leads found.", 404
         
-    return send_file(
-        "leads.csv",
-        as_attachment=True,
-        download_name=f"leads_{datetime.now().strftime('%Y%m%d')}.csv",
-        mimetype="text/csv"
-    )
+    return send_log_download("leads", f"leads_{datetime.now().strftime('%Y%m%d')}.csv")
 
 @app.route("/download-failed-log")
 def download_failed_log():
@@ -805,25 +2570,23 @@ def download_failed_log():
     if not os.path.exists("failed_leads.csv"):
         return "No failed leads found.", 404
         
-    return send_file(
-        "failed_leads.csv",
-        as_attachment=True,
-        download_name=f"failed_leads_{datetime.now().strftime('%Y%m%d')}.csv",
-        mimetype="text/csv"
-    )
+    return send_log_download("failed", f"failed_leads_{datetime.now().strftime('%Y%m%d')}.csv")
 
 @app.route("/export-excel")
+@cached_output("leads", daily=True)
+@admin_gate
 def export_excel():
     """Export leads as Excel"""
     if not os.path.exists("leads.csv"):
         return "No leads found.", 404
         
-    df = pd.read_csv("leads.csv")
+    df = load_log("leads")
     
     # Apply filters if provided
     selected = request.args.get("campaign")
     selected_source = request.args.get("source")
     from_date = request.args.get("from_date")
+    search_filter = request.args.get("search")
     
     if selected and "Campaign_Name" in df.columns:
         df = df[df["Campaign_Name"] == selected]
@@ -831,6 +2594,9 @@ def export_excel():
     if selected_source and "Campaign_Source" in df.columns:
         df = df[df["Campaign_Source"] == selected_source]
         
+    if search_filter:
+        df = df[df.index.isin(search_leads("leads", search_filter))]
+        
     if from_date and "Timestamp" in df.columns:
         df["Timestamp"] = pd.to_datetime(df["Timestamp"], errors="coerce")
         df = df[df["Timestamp"].dt.date >= pd.to_datetime(from_date).date()]
@@ -853,12 +2619,14 @@ def export_excel():
     )
 
 @app.route("/export-failed-log")
+@cached_output("failed", daily=True)
+@admin_gate
 def export_failed_log():
     """Export failed leads as Excel"""
     if not os.path.exists("failed_leads.csv"):
         return "No failed leads found.", 404
         
-    df = pd.read_csv("failed_leads.csv")
+    df = load_log("failed")
     
     # Apply filters if provided
     selected_error = request.args.get("error_type")
@@ -889,145 +2657,211 @@ def export_failed_log():
         mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
     )
 
+def remove_failed_leads(fingerprints):
+    """Drop rows from failed_leads.csv by fingerprint, leaving everything else in place"""
+    fingerprints = set(fingerprints)
+    with log_lock("failed"):
+        df = load_log("failed", raw=True)
+        keep = [key not in fingerprints for key in row_fingerprints(df)]
+        rewrite_log(df[keep], "failed")
+
+def run_retry_failed(job, rows, remove_successful):
+    """Resend failed leads, taking delivered ones out of failed_leads.csv as it goes"""
+    delivered = []
+    for fingerprint, row_id, name, lead_data, targets in rows:
+        try:
+            # Don't spend API quota on leads Salesforce would reject
+            lead_data, errors = validate_lead(lead_data)
+            if errors:
+                job.record(False, {"id": row_id, "name": name, "status": "Invalid", "message": "; ".join(errors)})
+            else:
+                targets = targets or lead_router.targets(lead_data)
+                admission.admit(lead_data, targets, heartbeat=job.heartbeat)
+                # The row stays in failed_leads.csv until it goes through, so don't log it again
+                status, response = delivery_outcome(deliver_lead(lead_data, targets, log_failed=False))
+                
+                if 200 <= status < 300:
+                    delivered.append(fingerprint)
+                    job.record(True, {"id": row_id, "name": name, "status": "Success", "message": "Lead sent successfully"})
+                else:
+                    job.record(False, {"id": row_id, "name": name, "status": "Failed",
+                                       "message": f"Status: {status}, Response: {response}"})
+                
+        except Exception as e:
+            job.record(False, {"id": row_id, "name": name, "status": "Error", "message": str(e)})
+        
+        # Remove delivered leads in batches so a killed worker can't resend them all
+        if job.commit_due():
+            if remove_successful and delivered:
+                remove_failed_leads(delivered)
+                delivered = []
+            job.checkpoint()
+    
+    if remove_successful and delivered:
+        remove_failed_leads(delivered)
+
 @app.route("/retry-failed", methods=["POST"])
+@admin_gate
 def retry_failed():
-    """Retry failed leads"""
+    """Retry failed leads as a background job"""
     if not os.path.exists("failed_leads.csv"):
         return jsonify({"message": "No failed leads to retry"}), 404
     
     # Check if specific IDs are provided for selective retry
     selected_ids = request.json.get("ids") if request.json else None
+    remove_successful = request.json.get("removeSuccessful", True) if request.json else True
     
-    df = pd.read_csv("failed_leads.csv")
+    df = load_log("failed", raw=True)
+    df["Fingerprint"] = list(row_fingerprints(df))
     df = df.reset_index().rename(columns={"index": "ID"})
     
     # Filter by selected IDs if provided
     if selected_ids:
         df = df[df["ID"].isin(selected_ids)]
     
-    results = {"success": 0, "failure": 0, "details": []}
-    successful_indices = []
-    
-    for index, row in df.iterrows():
-        try:
-            # Process purchase timeframe if it's in Arabic
-            purchase_time_frame = "More than 3 months"
-            
-            # Extract data from row, removing old Purchase_TimeFrame fields
-            row_data = row.to_dict()
-            if "Purchase_Time_Frame" in row_data and row_data["Purchase_Time_Frame"]:
-                purchase_time_frame = get_purchase_timeframe(row_data["Purchase_Time_Frame"])
-            elif "Purchase_TimeFrame" in row_data and row_data["Purchase_TimeFrame"]:
-                purchase_time_frame = get_purchase_timeframe(row_data["Purchase_TimeFrame"])
-                
-            lead_data = {
-                "Enquiry_Type": "Book_a_Test_Drive",
-                "Firstname": row.get("Firstname", ""),
-                "Lastname": row.get("Lastname", ""),
-                "Mobile": row.get("Mobile", ""),
-                "Email": row.get("Email", ""),
-                "DealerCode": "PTC",
-                "Shrm_SvCtr": "PETROMIN Jubail",
-                "Make": "Jeep",
-                "Line": "Wrangler",
-                "Entry_Form": "EN",
-                "Market": "Saudi Arabia",
-                "Campaign_Source": row.get("Campaign_Source", ""),
-                "Campaign_Name": row.get("Campaign_Name", ""),
-                "Campaign_Medium": "Boopin",
-                "TestDriveType": "In Showroom",
-                "Extended_Privacy": "true",
-                "Purchase_Time_Frame": purchase_time_frame,  # Only use the correct field
-                "Source_Site": row.get("Campaign_Source", "").lower() + " Ads" if row.get("Campaign_Source") else "",
-                "Marketing_Communication_Consent": "1",
-                "Fund": "DD",
-                "FormCode": "PET_Q2_25",
-                "Request_Origin": "https://www.jeep-saudi.com",
-                "MasterKey": "Jeep_EN_GENERIC_RI:RP:TD_0_8_1_6_50_42"
-            }
-            
-            token = get_salesforce_token()
-            status, response = send_to_salesforce(token, lead_data)
-            
-            if 200 <= status < 300:
-                log_lead(lead_data, status)
-                results["success"] += 1
-                successful_indices.append(index)
-                results["details"].append({
-                    "id": int(row.get("ID", 0)),
-                    "name": f"{row.get('Firstname', '')} {row.get('Lastname', '')}",
-                    "status": "Success",
-                    "message": "Lead sent successfully"
-                })
-            else:
-                results["failure"] += 1
-                results["details"].append({
-                    "id": int(row.get("ID", 0)),
-                    "name": f"{row.get('Firstname', '')} {row.get('Lastname', '')}",
-                    "status": "Failed",
-                    "message": f"Status: {status}, Response: {response}"
-                })
-                
-        except Exception as e:
-            results["failure"] += 1
-            results["details"].append({
-                "id": int(row.get("ID", 0)),
-                "name": f"{row.get('Firstname', '')} {row.get('Lastname', '')}",
-                "status": "Error",
-                "message": str(e)
-            })
-    
-    # Remove successful leads from the failed_leads.csv if requested
-    if request.json and request.json.get("removeSuccessful", True) and successful_indices:
-        original_df = pd.read_csv("failed_leads.csv")
-        original_df = original_df.reset_index().rename(columns={"index": "ID"})
-        original_df = original_df[~original_df.index.isin(successful_indices)]
-        original_df = original_df.drop(columns=["ID"])
-        original_df.to_csv("failed_leads.csv", index=False)
-    
-    return jsonify({"results": results})
+    rows = [
+        (row["Fingerprint"], int(row["ID"]), f"{row.get('Firstname', '')} {row.get('Lastname', '')}",
+         lead_from_log_row("failed", row), failed_row_targets(row))
+        for _, row in df.iterrows()
+    ]
+    job = start_job("retry-failed", len(rows), lambda job: run_retry_failed(job, rows, remove_successful))
+    return jsonify({"job_id": job.id, "total": len(rows)}), 202
+
+@app.route("/api/jobs/<job_id>")
+def job_progress(job_id):
+    """API endpoint for background job progress"""
+    job = load_job(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    return jsonify(job)
 
 @app.route("/dashboard")
+@conditional_on_logs("leads", "failed", daily=True)
+@cached_output("leads", "failed", daily=True)
+@admin_gate
 def dashboard():
     """Display dashboard with charts"""
-    if not os.path.exists("leads.csv"):
-        return render_template("dashboard.html", title="Dashboard", 
-                              labels=json.dumps([]), values=json.dumps([]))
-    
-    df = pd.read_csv("leads.csv")
-    
     # Count leads by source
-    if "Campaign_Source" in df.columns:
-        source_counts = df["Campaign_Source"].value_counts()
-        labels = source_counts.index.tolist()
-        values = source_counts.values.tolist()
-    else:
-        labels, values = [], []
+    source_counts = sorted(
+        query_rollups(["leads"], grain="all", group=["source"]),
+        key=lambda b: b["count"],
+        reverse=True
+    )
+    labels = [b["source"] for b in source_counts]
+    values = [b["count"] for b in source_counts]
+    
+    # Daily delivered vs failed over the last 30 days
+    start = (datetime.now() - timedelta(days=29)).strftime("%Y-%m-%d")
+    days = pd.date_range(start=start, periods=30).strftime("%Y-%m-%d").tolist()
+    daily = {"success": dict.fromkeys(days, 0), "failed": dict.fromkeys(days, 0)}
+    for b in query_rollups(["leads", "failed"], grain="day", group=["status"], start=start):
+        daily[b["status"]][b["bucket"]] = b["count"]
+    
+    # Overall success/failure rates
+    totals = {b["status"]: b["count"] for b in query_rollups(["leads", "failed"], grain="all", group=["status"])}
+    total = totals.get("success", 0) + totals.get("failed", 0)
+    success_rate = round(100 * totals.get("success", 0) / total, 1) if total else None
+    failure_rate = round(100 * totals.get("failed", 0) / total, 1) if total else None
     
     return render_template(
         "dashboard.html",
         title="Dashboard", 
         labels=json.dumps(labels),
-        values=json.dumps(values)
+        values=json.dumps(values),
+        trend_labels=json.dumps(days),
+        trend_success=json.dumps(list(daily["success"].values())),
+        trend_failed=json.dumps(list(daily["failed"].values())),
+        success_rate=success_rate,
+        failure_rate=failure_rate
+    )
+
+@app.route("/api/rollups")
+@conditional_on_logs("leads", "failed", "google")
+def api_rollups():
+    """API endpoint for pre-aggregated lead counts
+    
+    Query parameters: log (comma separated, default all), grain (hour, day,
+    month or all), group (comma separated: source, campaign, status) and
+    inclusive from/to bounds such as 2025-05-01 or "2025-05-01 13".
+    """
+    log_names = [name for name in request.args.get("log", "").split(",") if name] or list(LEAD_LOGS)
+    grain = request.args.get("grain", "day")
+    group = [name for name in request.args.get("group", "").split(",") if name]
+    
+    unknown_logs = [name for name in log_names if name not in LEAD_LOGS]
+    if unknown_logs:
+        return jsonify({"error": f"Unknown log: {', '.join(unknown_logs)}"}), 400
+    if grain not in ROLLUP_GRAINS:
+        return jsonify({"error": f"Unknown grain: {grain}"}), 400
+    unknown_groups = [name for name in group if name not in ROLLUP_GROUPS]
+    if unknown_groups:
+        return jsonify({"error": f"Unknown group: {', '.join(unknown_groups)}"}), 400
+    
+    buckets = query_rollups(
+        log_names,
+        grain=grain,
+        group=group,
+        start=request.args.get("from"),
+        end=request.args.get("to")
     )
+    return jsonify({"log": log_names, "grain": grain, "group": group, "buckets": buckets})
+
+@app.route("/api/analytics")
+@conditional_on_logs("leads", "failed", "google", daily=True)
+def api_analytics():
+    """API endpoint for chart-ready lead time series
+    
+    Query parameters: log (comma separated, default all), grain (hour, day or
+    week), group (source, campaign or status), top (series to keep before
+    folding the rest into "Other", default 10) and inclusive from/to dates
+    (YYYY-MM-DD). The window defaults to the last 2 days, 30 days or 12 weeks.
+    """
+    log_names = [name for name in request.args.get("log", "").split(",") if name] or list(LEAD_LOGS)
+    grain = request.args.get("grain", "day")
+    group = request.args.get("group", "")
+    
+    unknown_logs = [name for name in log_names if name not in LEAD_LOGS]
+    if unknown_logs:
+        return jsonify({"error": f"Unknown log: {', '.join(unknown_logs)}"}), 400
+    if grain not in ANALYTICS_GRAINS:
+        return jsonify({"error": f"Unknown grain: {grain}"}), 400
+    if group and group not in ROLLUP_GROUPS:
+        return jsonify({"error": f"Unknown group: {group}"}), 400
+    
+    try:
+        top = max(1, int(request.args.get("top", 10)))
+        today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        end = datetime.strptime(request.args["to"], "%Y-%m-%d") if request.args.get("to") else today
+        if request.args.get("from"):
+            start = datetime.strptime(request.args["from"], "%Y-%m-%d")
+        else:
+            start = end - timedelta(days=ANALYTICS_GRAINS[grain][1] - 1)
+    except ValueError:
+        return jsonify({"error": "from/to must be dates like 2025-05-01 and top a number"}), 400
+    
+    if grain == "week":
+        # Whole weeks, starting on Monday
+        start -= timedelta(days=start.weekday())
+    if start > end:
+        return jsonify({"error": "from must not be after to"}), 400
+    buckets = (end - start).days + 1
+    buckets = buckets * 24 if grain == "hour" else buckets // 7 + 1 if grain == "week" else buckets
+    if buckets > ANALYTICS_MAX_BUCKETS:
+        return jsonify({"error": f"Window too large: {buckets} {grain} buckets (max {ANALYTICS_MAX_BUCKETS})"}), 400
+    
+    log_names = tuple(sorted(set(log_names)))
+    versions = tuple(log_version(name)[0] for name in log_names)
+    return jsonify(analytics_series(log_names, grain, group, start, end, top, versions))
 
 @app.route("/api/stats")
+@conditional_on_logs("leads", "failed")
+@cached_output("leads", "failed")
+@admin_gate
 def api_stats():
     """API endpoint for dashboard stats"""
-    lead_count = 0
-    failed_count = 0
-    last_time = "-"
-    
-    if os.path.exists("leads.csv"):
-        df = pd.read_csv("leads.csv")
-        lead_count = len(df)
-        if lead_count > 0 and "Timestamp" in df.columns:
-            timestamp = df["Timestamp"].iloc[-1]
-            last_time = format_timestamp_for_display(timestamp)
-    
-    if os.path.exists("failed_leads.csv"):
-        failed_df = pd.read_csv("failed_leads.csv")
-        failed_count = len(failed_df)
+    lead_count, timestamp = log_summary("leads")
+    failed_count, _ = log_summary("failed")
+    last_time = format_timestamp_for_display(timestamp) if timestamp is not None else "-"
     
     return jsonify({
         "lead_count": lead_count,
@@ -1035,23 +2869,286 @@ def api_stats():
         "last_time": last_time
     })
 
+@app.route("/api/admission")
+def api_admission():
+    """API endpoint for rate limit bucket state, deferred queue depth and admin slots"""
+    return jsonify({
+        "buckets": admission.state(),
+        "deferred_count": deferred_leads.depth(),
+        "admin": admin_gate.state(),
+        "streams": live_events.state(),
+        "output_cache": output_cache.state(),
+        "workers": WEB_CONCURRENCY
+    })
+
+warmup_state = {"warm": False, "duration_ms": None, "steps": {}}
+
+def prime_lead_caches():
+    """Build the search indexes and rollups from the logs on disk"""
+    for index in search_indexes.values():
+        with index.lock:
+            index.refresh()
+    for rollup in rollups.values():
+        rollup.refresh()
+    # First use of the C parser and HTML writer pays for lazy imports
+    pd.read_csv(io.StringIO("a,b\n1,2\n")).to_html()
+
+def open_org_connection(org):
+    """Open a pooled connection to an org's instance ahead of the first lead"""
+    org.session.head(org.get_token()["instance_url"], timeout=SF_REQUEST_TIMEOUT, allow_redirects=False)
+
+def warm_up(heartbeat=None, heartbeat_interval=5):
+    """Pay the cold-start costs before the worker takes traffic.
+
+    Called from gunicorn's post_worker_init hook. A failing step is recorded
+    and the worker still starts; /readyz reports it until warm-up succeeds.
+    Building the lead caches grows with the history, so with heartbeat the
+    steps run on their own thread and heartbeat() is called every
+    heartbeat_interval seconds until they finish; gunicorn passes
+    worker.notify so a long warm-up isn't taken for a hung worker.
+    """
+    if heartbeat is None:
+        run_warm_up_steps()
+        return
+    thread = threading.Thread(target=run_warm_up_steps, name="warm-up", daemon=True)
+    thread.start()
+    while thread.is_alive():
+        heartbeat()
+        thread.join(heartbeat_interval)
+
+def run_warm_up_steps():
+    """Run every warm-up step and record the outcome in warmup_state"""
+    started = time.monotonic()
+    steps = [
+        ("templates", lambda: [app.jinja_env.get_template(name) for name in app.jinja_env.list_templates()]),
+        ("lead_caches", prime_lead_caches),
+    ]
+    for org in salesforce_orgs.values():
+        steps.append((f"salesforce_token:{org.name}", org.get_token))
+        steps.append((f"salesforce_connection:{org.name}", functools.partial(open_org_connection, org)))
+    for name, step in steps:
+        step_started = time.monotonic()
+        try:
+            step()
+            warmup_state["steps"][name] = {"ok": True}
+        except Exception as e:
+            warmup_state["steps"][name] = {"ok": False, "error": str(e)}
+        warmup_state["steps"][name]["ms"] = round((time.monotonic() - step_started) * 1000, 1)
+    
+    warmup_state["duration_ms"] = round((time.monotonic() - started) * 1000, 1)
+    warmup_state["warm"] = all(step["ok"] for step in warmup_state["steps"].values())
+
+@app.route("/healthz")
+def healthz():
+    """Liveness check: the worker is up and answering"""
+    return jsonify({"status": "alive"})
+
+@app.route("/readyz")
+def readyz():
+    """Readiness check: warm-up finished and every step succeeded"""
+    status = 200 if warmup_state["warm"] else 503
+    return jsonify({"status": "warm" if warmup_state["warm"] else "cold", **warmup_state}), status
+
+# Debug endpoints answer 404 unless DEBUG_TOKEN is set and sent in the
+# X-Debug-Token header (never the query string, which ends up in access logs)
+DEBUG_TOKEN = os.getenv("DEBUG_TOKEN", "")
+PROFILE_MAX_SECONDS = 60
+PROFILES_DIR = "profiles"
+
+def debug_authorized():
+    supplied = request.headers.get("X-Debug-Token", "")
+    # Compared as bytes, since compare_digest refuses non-ASCII str
+    return bool(DEBUG_TOKEN) and hmac.compare_digest(supplied.encode("utf-8"), DEBUG_TOKEN.encode("utf-8"))
+
+def debug_only(view):
+    """Hide a view unless the request carries the debug token"""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if not debug_authorized():
+            return jsonify({"error": "Not found"}), 404
+        return view(*args, **kwargs)
+    return wrapper
+
+def frame_label(code):
+    """function (path:line) with site-packages paths shortened to the package"""
+    path = code.co_filename
+    if "site-packages" in path:
+        path = path.split("site-packages" + os.sep, 1)[1]
+    else:
+        path = os.path.basename(path)
+    return f"{code.co_name} ({path}:{code.co_firstlineno})"
+
+class StackSampler:
+    """Sample the Python stack of every thread in this worker at a fixed interval.
+
+    Stacks are counted in collapsed form ("thread;outer;...;inner count"), which
+    flamegraph.pl, speedscope and similar tools read directly. Sampling only
+    reads sys._current_frames(), so the threads being watched aren't slowed
+    beyond the sampler's own share of the GIL.
+    """
+
+    def __init__(self, interval, thread_filter=""):
+        self.interval = interval
+        self.thread_filter = thread_filter
+        self.counts = {}
+        self.samples = 0
+
+    def run(self, seconds):
+        me = threading.get_ident()
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                name = names.get(ident, str(ident))
+                if ident == me or self.thread_filter not in name:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(frame_label(frame.f_code))
+                    frame = frame.f_back
+                # Numbered pool threads are folded together
+                key = re.sub(r"[-_ ]?\d+$", "", name) + ";" + ";".join(reversed(stack))
+                self.counts[key] = self.counts.get(key, 0) + 1
+            self.samples += 1
+            time.sleep(self.interval)
+
+    def collapsed(self):
+        return "".join(f"{stack} {count}\n" for stack, count in sorted(self.counts.items()))
+
+profile_lock = threading.Lock()
+
+@app.route("/debug/profile")
+@debug_only
+def debug_profile():
+    """Sample this worker's threads for a few seconds and return collapsed stacks
+    
+    Query parameters: seconds (default 10, max 60), interval_ms (default 10) and
+    thread (only threads whose name contains this text, e.g. "admin").
+    """
+    try:
+        seconds = min(float(request.args.get("seconds", 10)), PROFILE_MAX_SECONDS)
+        interval = max(float(request.args.get("interval_ms", 10)), 1) / 1000
+    except ValueError:
+        return jsonify({"error": "seconds and interval_ms must be numbers"}), 400
+    if not profile_lock.acquire(blocking=False):
+        return jsonify({"error": "A profile is already running in this worker"}), 409
+    try:
+        sampler = StackSampler(interval, request.args.get("thread", ""))
+        sampler.run(seconds)
+    finally:
+        profile_lock.release()
+    
+    return Response(sampler.collapsed(), mimetype="text/plain", headers={
+        "X-Worker-Pid": str(os.getpid()),
+        "X-Profile-Samples": str(sampler.samples)
+    })
+
+# Requests sent with an X-Debug-Profile header (and the debug token) run under cProfile
+REQUEST_PROFILES = "lead_app.profiles"
+
+@app.before_request
+def start_request_profile():
+    if "X-Debug-Profile" in request.headers and debug_authorized():
+        profile = cProfile.Profile()
+        request.environ[REQUEST_PROFILES] = [profile]
+        profile.enable()
+
+def profiled_in_thread(view):
+    """Keep profiling a tagged request when its view runs on another thread"""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        profiles = request.environ.get(REQUEST_PROFILES)
+        if profiles is None:
+            return view(*args, **kwargs)
+        profile = cProfile.Profile()
+        profiles.append(profile)
+        profile.enable()
+        try:
+            return view(*args, **kwargs)
+        finally:
+            profile.disable()
+    return wrapper
+
+@app.after_request
+def save_request_profile(response):
+    profiles = request.environ.pop(REQUEST_PROFILES, None)
+    if profiles:
+        profiles[0].disable()
+        profile_id = uuid.uuid4().hex[:12]
+        os.makedirs(PROFILES_DIR, exist_ok=True)
+        pstats.Stats(*profiles).dump_stats(os.path.join(PROFILES_DIR, f"{profile_id}.prof"))
+        response.headers["X-Profile-Id"] = profile_id
+    return response
+
+@app.route("/debug/profiles/<profile_id>")
+@debug_only
+def debug_request_profile(profile_id):
+    """A saved request profile as a pstats report, or the raw .prof file with raw=1
+    
+    Query parameters: sort (default cumulative) and limit (default 40 rows).
+    """
+    path = os.path.join(PROFILES_DIR, f"{profile_id}.prof")
+    if not re.fullmatch(r"[0-9a-f]{12}", profile_id) or not os.path.exists(path):
+        return jsonify({"error": "Unknown profile"}), 404
+    if request.args.get("raw"):
+        return send_file(os.path.abspath(path), as_attachment=True, download_name=f"{profile_id}.prof")
+    
+    output = io.StringIO()
+    stats = pstats.Stats(path, stream=output)
+    try:
+        stats.sort_stats(request.args.get("sort", "cumulative"))
+        stats.print_stats(int(request.args.get("limit", 40)))
+    except (KeyError, ValueError):
+        return jsonify({"error": "Unknown sort key or bad limit"}), 400
+    return Response(output.getvalue(), mimetype="text/plain")
+
+# Streams are closed after this long so threads are recycled; browsers reconnect
+STREAM_MAX_SECONDS = 300
+
+@app.route("/api/stream")
+def api_stream():
+    """Server-Sent Events stream of lead activity and live counters"""
+    subscriber = live_events.subscribe()
+    if subscriber is None:
+        response = jsonify({"error": "Too many live connections, poll /api/stats instead"})
+        response.status_code = 503
+        response.headers["Retry-After"] = "30"
+        return response
+    
+    def stream():
+        try:
+            yield "retry: 5000\n\n"
+            yield format_sse("counters", live_events.counters())
+            deadline = time.monotonic() + STREAM_MAX_SECONDS
+            while time.monotonic() < deadline:
+                try:
+                    event, data = subscriber.get(timeout=15)
+                except queue.Empty:
+                    # Comment line keeps proxies from closing an idle stream
+                    yield ": keepalive\n\n"
+                    continue
+                yield format_sse(event, data)
+        finally:
+            live_events.unsubscribe(subscriber)
+    
+    response = Response(
+        stream(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+    # Also covers clients that disconnect before the stream starts
+    response.call_on_close(lambda: live_events.unsubscribe(subscriber))
+    return response
+
 @app.route("/")
+@conditional_on_logs("leads", "failed")
+@cached_output("leads", "failed")
+@admin_gate
 def index():
     """Render homepage with statistics"""
-    lead_count = 0
-    failed_count = 0
-    last_time = "-"
-    
-    if os.path.exists("leads.csv"):
-        df = pd.read_csv("leads.csv")
-        lead_count = len(df)
-        if lead_count > 0 and "Timestamp" in df.columns:
-            timestamp = df["Timestamp"].iloc[-1]
-            last_time = format_timestamp_for_display(timestamp)
-    
-    if os.path.exists("failed_leads.csv"):
-        failed_df = pd.read_csv("failed_leads.csv")
-        failed_count = len(failed_df)
+    lead_count, timestamp = log_summary("leads")
+    failed_count, _ = log_summary("failed")
+    last_time = format_timestamp_for_display(timestamp) if timestamp is not None else "-"
         
     return render_template(
         "index.html", 
@@ -1062,4 +3159,5 @@ def index():
     )
 
 if __name__ == "__main__":
+    warm_up()
     app.run(host="0.0.0.0", port=5000)
@@ -0,0 +1,147 @@
+"""Write large, realistic lead logs for benchmarking the read paths.
+
+Produces leads.csv, failed_leads.csv and google_leads.csv with the same
+columns the app writes, a year of timestamps in order, and a mix of English
+and Arabic names and campaigns:
+
+    python benchmarks/generate_leads.py --rows 100000 --out /tmp/leads-100k
+    python benchmarks/generate_leads.py --rows 1000000 --out /tmp/leads-1m
+
+failed_leads.csv gets a fifth as many rows as the other two logs.
+"""
+import argparse
+import csv
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+LEADS_COLUMNS = [
+    "Timestamp", "Status", "Error", "Firstname", "Lastname", "Mobile", "Email",
+    "DealerCode", "Shrm_SvCtr", "Make", "Line", "Entry_Form", "Market",
+    "Campaign_Source", "Campaign_Name", "Campaign_Medium", "TestDriveType",
+    "Extended_Privacy", "Purchase_TimeFrame", "Source_Site",
+    "Marketing_Communication_Consent", "Fund", "FormCode", "Request_Origin",
+    "MasterKey", "Enquiry_Type"
+]
+FAILED_COLUMNS = [
+    "Timestamp", "Error", "Status", "Response", "Firstname", "Lastname",
+    "Mobile", "Email", "Campaign_Source", "Campaign_Name"
+]
+GOOGLE_COLUMNS = [
+    "Timestamp", "FirstName", "LastName", "Email", "Phone",
+    "CampaignID", "CampaignName", "AdGroupID", "AdGroupName",
+    "SentToSalesforce", "SalesforceStatus", "LastSentTimestamp"
+]
+
+FIRST_NAMES = [
+    "Mohammed", "Abdullah", "Fahad", "Khalid", "Sara", "Noura", "Reem", "Omar",
+    "محمد", "عبدالله", "فهد", "خالد", "سارة", "نورة", "ريم", "عمر", "فيصل", "هيفاء"
+]
+LAST_NAMES = [
+    "Al-Qahtani", "Al-Otaibi", "Al-Ghamdi", "Al-Harbi", "Al-Zahrani", "Al-Shehri",
+    "القحطاني", "العتيبي", "الغامدي", "الحربي", "الزهراني", "الشهري", "الدوسري"
+]
+SOURCES = ["Snapchat", "TikTok", "Snapchat", "TikTok", "Meta", "Website"]
+CAMPAIGNS = [
+    "PET-Q2-2025", "PET-Q3-2025", "Wrangler-Launch", "Grand-Cherokee-Offers",
+    "رمضان-2025", "عروض-اليوم-الوطني", "Compass-Test-Drive", "Gladiator-Ramadan"
+]
+# Purchase timeframes as the platforms send them, Arabic forms included
+TIMEFRAMES = ["More than 3 months", "1-3 months", "Less than 1 month",
+              "أكثر من 3 أشهر", "1-3 أشهر", "في أقرب وقت (أقل من شهر)"]
+SALESFORCE_ERRORS = [
+    (400, '[{"message":"Mobile: invalid format","errorCode":"FIELD_CUSTOM_VALIDATION_EXCEPTION"}]'),
+    (400, '[{"message":"Duplicate lead detected","errorCode":"DUPLICATES_DETECTED"}]'),
+    (500, "Read timed out. (read timeout=30)"),
+    (503, "Service Unavailable"),
+]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generate large synthetic lead logs")
+    parser.add_argument("--rows", type=int, default=100000, help="rows in leads.csv and google_leads.csv")
+    parser.add_argument("--out", required=True, help="directory to write the logs into")
+    parser.add_argument("--days", type=int, default=365, help="history length in days (default 365)")
+    parser.add_argument("--seed", type=int, default=1, help="random seed, for reproducible files")
+    return parser.parse_args()
+
+
+def timestamps(rows, days, iso=False):
+    """rows evenly spread, in order, over the last days days"""
+    start = datetime.now() - timedelta(days=days)
+    step = days * 86400 / max(rows, 1)
+    for i in range(rows):
+        moment = start + timedelta(seconds=i * step)
+        yield moment.isoformat() if iso else moment.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def person(rng, i):
+    first = rng.choice(FIRST_NAMES)
+    last = rng.choice(LAST_NAMES)
+    mobile = f"05{rng.randrange(10 ** 8):08d}"
+    email = f"lead{i}@example.com" if rng.random() < 0.8 else f"{i}.{rng.randrange(1000)}@gmail.com"
+    return first, last, mobile, email
+
+
+def write_leads(path, rows, days, rng):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(LEADS_COLUMNS)
+        for i, timestamp in enumerate(timestamps(rows, days, iso=True)):
+            first, last, mobile, email = person(rng, i)
+            source = rng.choice(SOURCES)
+            writer.writerow([
+                timestamp, 201, "Successfully Saved", first, last, mobile, email,
+                "PTC", "PETROMIN Jubail", "Jeep", rng.choice(["Wrangler", "Grand Cherokee", "Compass"]),
+                rng.choice(["EN", "AR"]), "Saudi Arabia", source, rng.choice(CAMPAIGNS), "Boopin",
+                "In Showroom", "true", rng.choice(TIMEFRAMES), source.lower() + " Ads", "1", "DD",
+                "PET_Q2_25", "https://www.jeep-saudi.com", "Jeep_EN_GENERIC_RI:RP:TD_0_8_1_6_50_42",
+                "Book_a_Test_Drive"
+            ])
+
+
+def write_failed(path, rows, days, rng):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(FAILED_COLUMNS)
+        for i, timestamp in enumerate(timestamps(rows, days)):
+            first, last, mobile, email = person(rng, i)
+            status, response = rng.choice(SALESFORCE_ERRORS)
+            writer.writerow([timestamp, "API Error", status, response, first, last, mobile, email,
+                             rng.choice(SOURCES), rng.choice(CAMPAIGNS)])
+
+
+def write_google(path, rows, days, rng):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(GOOGLE_COLUMNS)
+        for i, timestamp in enumerate(timestamps(rows, days)):
+            first, last, mobile, email = person(rng, i)
+            campaign = rng.randrange(len(CAMPAIGNS))
+            sent = rng.random() < 0.9
+            writer.writerow([timestamp, first, last, email, mobile, 20000 + campaign, CAMPAIGNS[campaign],
+                             30000 + rng.randrange(40), f"AdGroup {rng.randrange(40)}",
+                             sent, 201 if sent else "", timestamp if sent else ""])
+
+
+def write_dataset(directory, rows, days=365, seed=1):
+    """Write all three logs into directory"""
+    os.makedirs(directory, exist_ok=True)
+    rng = random.Random(seed)
+    write_leads(os.path.join(directory, "leads.csv"), rows, days, rng)
+    write_failed(os.path.join(directory, "failed_leads.csv"), rows // 5, days, rng)
+    write_google(os.path.join(directory, "google_leads.csv"), rows, days, rng)
+
+
+def main():
+    args = parse_args()
+    write_dataset(args.out, args.rows, args.days, args.seed)
+    for name in ("leads.csv", "failed_leads.csv", "google_leads.csv"):
+        path = os.path.join(args.out, name)
+        print(f"{path}: {os.path.getsize(path) / 1e6:.1f} MB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
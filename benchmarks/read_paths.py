@@ -0,0 +1,183 @@
+"""Time the dashboard pages, APIs and exports against a large lead history.
+
+Generates (or reuses) a synthetic dataset, then requests each read path
+in-process through Flask's test client. For each route it records the cold
+first request, the median and fastest of the warm repeats (in-memory indexes
+built, output cache emptied), a request served from the output cache, and
+peak traced memory, and writes everything to a JSON report. Pass an earlier report with
+--compare to see the change per route:
+
+    python benchmarks/read_paths.py --rows 100000 --report before.json
+    python benchmarks/read_paths.py --rows 100000 --report after.json --compare before.json --max-regression 1.25
+
+Peak memory is measured in a separate traced run, since tracemalloc slows
+everything down.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+from datetime import datetime
+
+from generate_leads import write_dataset
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ROUTES = [
+    "/",
+    "/api/stats",
+    "/dashboard",
+    "/logs",
+    "/logs?search=qahtani",
+    "/failed-logs",
+    "/google-leads",
+    "/google-leads?search=sara",
+    "/google-leads?campaign=PET-Q2-2025&page=3",
+    "/api/rollups?grain=day&group=source",
+    "/api/analytics?grain=day&group=campaign",
+    "/download-log",
+    "/download-google-leads",
+    "/export-failed-log",
+    "/export-excel",
+    "/export-google-excel",
+]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the read paths against a large lead history")
+    parser.add_argument("--rows", type=int, default=10000, help="dataset size (10000, 100000, 1000000...)")
+    parser.add_argument("--data", help="directory with an existing dataset (default: generate one)")
+    parser.add_argument("--repeat", type=int, default=3, help="warm requests per route")
+    parser.add_argument("--routes", help="only routes containing this text")
+    parser.add_argument("--skip-excel", action="store_true", help="skip the xlsx exports (slow on big histories)")
+    parser.add_argument("--report", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="earlier JSON report to compare against")
+    parser.add_argument("--max-regression", type=float,
+                        help="exit 1 if any route's median time or peak memory grew by more than this factor")
+    return parser.parse_args()
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR,
+                              capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return ""
+
+
+def measure(client, route, repeat, clear_output_cache):
+    """Cold, warm and cached times and peak traced memory for one route"""
+    clear_output_cache()
+    started = time.perf_counter()
+    response = client.get(route)
+    body = response.get_data()
+    cold = (time.perf_counter() - started) * 1000
+
+    warm = []
+    for _ in range(repeat):
+        clear_output_cache()
+        started = time.perf_counter()
+        client.get(route).get_data()
+        warm.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    client.get(route).get_data()
+    cached = (time.perf_counter() - started) * 1000
+
+    clear_output_cache()
+    tracemalloc.start()
+    client.get(route).get_data()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "status": response.status_code,
+        "bytes": len(body),
+        "cold_ms": round(cold, 1),
+        "median_ms": round(statistics.median(warm), 1) if warm else round(cold, 1),
+        "min_ms": round(min(warm), 1) if warm else round(cold, 1),
+        "cached_ms": round(cached, 1),
+        "peak_mb": round(peak / 1e6, 1)
+    }
+
+
+def main():
+    args = parse_args()
+    data_dir = args.data or tempfile.mkdtemp(prefix=f"leads-{args.rows}-")
+    if not args.data:
+        print(f"Generating {args.rows} rows in {data_dir}...")
+        write_dataset(data_dir, args.rows)
+
+    # The app reads its logs relative to the working directory
+    report_path = os.path.abspath(args.report) if args.report else None
+    compare_path = os.path.abspath(args.compare) if args.compare else None
+    os.chdir(data_dir)
+    sys.path.insert(0, REPO_DIR)
+    warnings.simplefilter("ignore")
+    import app as lead_app
+    import pandas as pd
+
+    client = lead_app.app.test_client()
+    routes = [route for route in ROUTES if not args.routes or args.routes in route]
+    if args.skip_excel:
+        routes = [route for route in routes if "excel" not in route]
+
+    def clear_output_cache():
+        shutil.rmtree(lead_app.OUTPUT_CACHE_DIR, ignore_errors=True)
+
+    results = {}
+    for route in routes:
+        results[route] = measure(client, route, args.repeat, clear_output_cache)
+        result = results[route]
+        print(f"{route:<45} {result['status']:>3}  cold {result['cold_ms']:>9.1f} ms  "
+              f"median {result['median_ms']:>9.1f} ms  cached {result['cached_ms']:>7.1f} ms  "
+              f"peak {result['peak_mb']:>8.1f} MB")
+
+    report = {
+        "meta": {
+            "rows": args.rows,
+            "commit": git_commit(),
+            "date": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "repeat": args.repeat
+        },
+        "results": results
+    }
+    if report_path:
+        with open(report_path, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if not compare_path:
+        return 0
+
+    with open(compare_path) as f:
+        baseline = json.load(f)
+    print(f"\nCompared with {baseline['meta'].get('commit') or args.compare} ({baseline['meta']['rows']} rows)")
+    print(f"{'route':<45} {'time':>8} {'memory':>8}")
+    regressed = []
+    for route, result in results.items():
+        before = baseline["results"].get(route)
+        if not before:
+            continue
+        time_ratio = result["median_ms"] / before["median_ms"] if before["median_ms"] else 1
+        memory_ratio = result["peak_mb"] / before["peak_mb"] if before["peak_mb"] else 1
+        print(f"{route:<45} {time_ratio:>7.2f}x {memory_ratio:>7.2f}x")
+        if args.max_regression and max(time_ratio, memory_ratio) > args.max_regression:
+            regressed.append(route)
+    if regressed:
+        print(f"\nRegressed beyond {args.max_regression}x: {', '.join(regressed)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
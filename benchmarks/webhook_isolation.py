@@ -0,0 +1,246 @@
+"""Measure /webhook latency while the admin pages and exports are under load.
+
+Starts gunicorn with the repo's gunicorn.conf.py against a large synthetic
+google_leads.csv and a local stand-in for Salesforce, then sends a steady
+stream of webhook leads: first on their own, then while several clients keep
+hammering the heaviest admin routes, and finally while more admin clients
+than each worker has request threads do the same. That runs once with the
+admin cap off (ADMIN_CONCURRENCY=0) and once with the configured cap, and
+prints the webhook latency percentiles for each phase.
+
+    python benchmarks/webhook_isolation.py
+    python benchmarks/webhook_isolation.py --rows 200000 --admin-clients 6 --max-ratio 2
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from generate_leads import write_dataset
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ADMIN_ROUTES = [
+    "/export-google-excel",
+    "/google-leads?search=ali",
+    "/download-google-leads?campaign=PET-Q2-2025",
+    "/export-excel",
+]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Webhook latency under admin load")
+    parser.add_argument("--rows", type=int, default=50000, help="rows in the synthetic google_leads.csv")
+    parser.add_argument("--rate", type=float, default=10, help="webhook leads per second")
+    parser.add_argument("--seconds", type=float, default=20, help="length of each phase")
+    parser.add_argument("--admin-clients", type=int, default=4, help="clients looping over the admin routes")
+    parser.add_argument("--flood-clients", type=int, default=24,
+                        help="admin clients for the flood phase (more than GUNICORN_THREADS)")
+    parser.add_argument("--workers", type=int, default=2, help="gunicorn WEB_CONCURRENCY")
+    parser.add_argument("--admin-concurrency", default="1", help="ADMIN_CONCURRENCY for the isolated run")
+    parser.add_argument("--salesforce-ms", type=float, default=30, help="simulated Salesforce response time")
+    parser.add_argument("--max-ratio", type=float,
+                        help="exit 1 if isolated p95 under either load exceeds the idle p95 by this factor")
+    return parser.parse_args()
+
+
+def start_fake_salesforce(delay):
+    """Answer the token and lead calls locally after a fixed delay"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            if self.path.endswith("/token"):
+                body = {"access_token": "bench", "instance_url": f"http://127.0.0.1:{self.server.server_port}"}
+                status = 200
+            else:
+                time.sleep(delay)
+                body = {"id": "00Q000000000001", "success": True}
+                status = 201
+            payload = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def start_app(directory, port, salesforce_port, workers, admin_concurrency):
+    env = dict(
+        os.environ,
+        PYTHONPATH=REPO_DIR,
+        WEB_CONCURRENCY=str(workers),
+        ADMIN_CONCURRENCY=str(admin_concurrency),
+        TOKEN_URL=f"http://127.0.0.1:{salesforce_port}/token",
+        SF_API_RATE_PER_MINUTE="100000",
+        SF_API_BURST="1000",
+        SOURCE_RATE_PER_MINUTE="100000",
+        SOURCE_BURST="1000",
+    )
+    process = subprocess.Popen(
+        ["gunicorn", "-c", os.path.join(REPO_DIR, "gunicorn.conf.py"), "-b", f"127.0.0.1:{port}", "app:app"],
+        cwd=directory, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    deadline = time.monotonic() + 120
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(f"http://127.0.0.1:{port}/readyz", timeout=1).status_code == 200:
+                return process
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    process.kill()
+    sys.exit("gunicorn did not become ready")
+
+
+def send_webhooks(base_url, rate, seconds):
+    """Send leads at a fixed rate and return (latencies in ms, error count)"""
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+    session_local = threading.local()
+
+    def send(i):
+        nonlocal errors
+        session = getattr(session_local, "session", None) or requests.Session()
+        session_local.session = session
+        lead = {
+            "Firstname": "Bench", "Lastname": f"Lead{i}", "Mobile": f"05{i % 100000000:08d}",
+            "Email": f"bench{i}@example.com", "Campaign_Source": "Snapchat", "Campaign_Name": "PET-Q2-2025"
+        }
+        started = time.perf_counter()
+        try:
+            ok = session.post(f"{base_url}/webhook", json=lead, timeout=60).status_code < 300
+        except requests.RequestException:
+            ok = False
+        elapsed = (time.perf_counter() - started) * 1000
+        with lock:
+            latencies.append(elapsed)
+            errors += not ok
+
+    threads = []
+    started = time.monotonic()
+    i = 0
+    while time.monotonic() - started < seconds:
+        thread = threading.Thread(target=send, args=(i,), daemon=True)
+        thread.start()
+        threads.append(thread)
+        i += 1
+        time.sleep(max(0, started + i / rate - time.monotonic()))
+    for thread in threads:
+        thread.join()
+    return latencies, errors
+
+
+def hammer_admin(base_url, stop, counts):
+    session = requests.Session()
+    while not stop.is_set():
+        route = random.choice(ADMIN_ROUTES)
+        try:
+            status = session.get(base_url + route, timeout=120).status_code
+        except requests.RequestException:
+            status = "error"
+        counts[status] = counts.get(status, 0) + 1
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return 0
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def summarize(label, latencies, errors):
+    return {
+        "phase": label,
+        "requests": len(latencies),
+        "errors": errors,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "max": max(latencies, default=0)
+    }
+
+
+def run_mode(args, directory, salesforce_port, admin_concurrency):
+    port = random.randint(20000, 40000)
+    process = start_app(directory, port, salesforce_port, args.workers, admin_concurrency)
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        # Let the first admin pages build their caches before measuring
+        for route in ADMIN_ROUTES:
+            requests.get(base_url + route, timeout=300)
+
+        phases = [summarize("idle", *send_webhooks(base_url, args.rate, args.seconds))]
+        for label, clients in (("admin load", args.admin_clients), ("admin flood", args.flood_clients)):
+            stop = threading.Event()
+            counts = {}
+            hammers = [threading.Thread(target=hammer_admin, args=(base_url, stop, counts), daemon=True)
+                       for _ in range(clients)]
+            for thread in hammers:
+                thread.start()
+            time.sleep(1)
+            loaded = summarize(label, *send_webhooks(base_url, args.rate, args.seconds))
+            stop.set()
+            for thread in hammers:
+                thread.join()
+            loaded["admin_responses"] = counts
+            phases.append(loaded)
+        return phases
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    args = parse_args()
+    directory = tempfile.mkdtemp(prefix="webhook-isolation-")
+    try:
+        print(f"Writing {args.rows} synthetic Google leads to {directory}")
+        write_dataset(directory, args.rows)
+        salesforce = start_fake_salesforce(args.salesforce_ms / 1000)
+
+        results = {}
+        for name, admin_concurrency in (("uncapped", 0), ("isolated", args.admin_concurrency)):
+            print(f"Running {name} (ADMIN_CONCURRENCY={admin_concurrency})...")
+            results[name] = run_mode(args, directory, salesforce.server_port, admin_concurrency)
+        salesforce.shutdown()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    print(f"\n{'mode':<10} {'phase':<12} {'reqs':>5} {'errors':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}  admin responses")
+    for name, phases in results.items():
+        for phase in phases:
+            print(f"{name:<10} {phase['phase']:<12} {phase['requests']:>5} {phase['errors']:>6} "
+                  f"{phase['p50']:>8.1f} {phase['p95']:>8.1f} {phase['p99']:>8.1f} {phase['max']:>8.1f}  "
+                  f"{phase.get('admin_responses', '')}")
+
+    baseline, *loaded_phases = results["isolated"]
+    worst = 0
+    for loaded in loaded_phases:
+        ratio = loaded["p95"] / baseline["p95"] if baseline["p95"] else 0
+        worst = max(worst, ratio)
+        print(f"Isolated webhook p95 under {loaded['phase']} is {ratio:.2f}x the idle p95")
+    if args.max_ratio and worst > args.max_ratio:
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
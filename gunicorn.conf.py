@@ -0,0 +1,27 @@
+# Gunicorn settings, picked up automatically by `gunicorn app:app`
+# (PORT and WEB_CONCURRENCY are read from the environment by gunicorn itself)
+import os
+
+# Threads let long-lived /api/stream connections share a worker with normal requests.
+# Streams (LIVE_STREAM_LIMIT) and admin pages and exports (see ConcurrencyGate) are
+# capped so INGEST_RESERVED_THREADS of them always stay free for lead ingestion.
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", "16"))
+
+# Seconds a worker may go without checking in. The warm-up below checks in
+# every few seconds however long the history takes to index.
+timeout = 60
+
+
+def post_worker_init(worker):
+    """Warm the worker up before it accepts its first request"""
+    from app import warm_up, warmup_state
+
+    warm_up(heartbeat=worker.notify)
+    worker.log.info(
+        "Worker %s warm-up %s in %sms: %s",
+        worker.pid,
+        "finished" if warmup_state["warm"] else "incomplete",
+        warmup_state["duration_ms"],
+        ", ".join(f"{name}={'ok' if step['ok'] else 'failed'}" for name, step in warmup_state["steps"].items())
+    )
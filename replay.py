@@ -0,0 +1,272 @@
+"""Replay leads from the CSV logs to Salesforce from the command line.
+
+Examples:
+    python replay.py failed --from 2025-05-01 --to 2025-05-02
+    python replay.py google --campaign "PET-Q2" --concurrency 8 --rate 300
+    python replay.py leads --source TikTok --dry-run
+
+Every lead that has been handled is appended to a checkpoint journal, keyed on
+the columns that identify the lead, so if the run crashes or is stopped with
+Ctrl-C, running the same command again carries on from where it stopped even
+if the log's status columns were rewritten in between. Use --restart to ignore
+an existing journal.
+
+Replaying the failed log takes delivered leads out of failed_leads.csv in
+batches, as the Retry button does, so they aren't sent again later; the
+journal notes each removal so identical leads left in the log still get sent.
+"""
+import argparse
+import hashlib
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+import pandas as pd
+
+from app import (
+    LEAD_LOGS,
+    SEARCH_FIELDS,
+    TokenBucket,
+    deliver_lead,
+    delivery_outcome,
+    failed_row_targets,
+    lead_from_log_row,
+    load_log,
+    remove_failed_leads,
+    row_fingerprints,
+    validate_lead,
+)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Replay leads from a lead log to Salesforce")
+    parser.add_argument("log", choices=sorted(LEAD_LOGS), help="which lead log to read")
+    parser.add_argument("--from", dest="start", help="only leads logged on or after this date (YYYY-MM-DD)")
+    parser.add_argument("--to", dest="end", help="only leads logged on or before this date (YYYY-MM-DD)")
+    parser.add_argument("--campaign", help="only leads whose campaign name contains this text")
+    parser.add_argument("--source", help="only leads from this Campaign_Source")
+    parser.add_argument("--limit", type=int, help="stop after this many leads")
+    parser.add_argument("--concurrency", type=int, default=4, help="parallel deliveries (default 4)")
+    parser.add_argument("--rate", type=float, default=60, help="maximum deliveries per minute (default 60)")
+    parser.add_argument("--checkpoint", help="journal path (default .replay_<log>.journal)")
+    parser.add_argument("--restart", action="store_true", help="ignore any existing checkpoint journal")
+    parser.add_argument("--dry-run", action="store_true", help="validate and count without sending")
+    return parser.parse_args()
+
+
+# Delivered failed leads are removed from failed_leads.csv this often
+REMOVE_BATCH_SIZE = 25
+REMOVE_BATCH_SECONDS = 5
+
+
+def campaign_column(log_name):
+    return "CampaignName" if log_name == "google" else "Campaign_Name"
+
+
+def lead_keys(log_name, df):
+    """Journal key per row: a hash of the columns that identify the lead.
+
+    Status columns are left out, so a key stays the same when the app marks
+    the lead as sent or records a new error for it.
+    """
+    columns = [column for column in ["Timestamp", campaign_column(log_name)] + SEARCH_FIELDS[log_name]
+               if column in df.columns]
+    for values in df[columns].itertuples(index=False, name=None):
+        yield hashlib.sha1("\x1f".join(values).encode("utf-8")).hexdigest()
+
+
+def load_rows(args):
+    """Read the log and apply the date, campaign and source filters.
+
+    Returns the matching rows and their fingerprints, which are taken over the
+    whole file so they identify the same rows remove_failed_leads() does.
+    """
+    path = LEAD_LOGS[args.log]
+    if not os.path.exists(path):
+        sys.exit(f"{path} not found")
+
+    # Everything as text so mobiles keep their leading zero
+    df = load_log(args.log, raw=True)
+    keys = pd.Series(list(row_fingerprints(df)), index=df.index, dtype=object)
+    timestamps = pd.to_datetime(df["Timestamp"], errors="coerce")
+    if args.start:
+        df = df[timestamps.dt.date >= pd.to_datetime(args.start).date()]
+    if args.end:
+        df = df[timestamps.dt.date <= pd.to_datetime(args.end).date()]
+
+    column = campaign_column(args.log)
+    if args.campaign and column in df.columns:
+        df = df[df[column].str.contains(args.campaign, case=False, regex=False)]
+    if args.source:
+        if args.log == "google":
+            df = df.iloc[0:0] if args.source.lower() != "google" else df
+        elif "Campaign_Source" in df.columns:
+            df = df[df["Campaign_Source"].str.lower() == args.source.lower()]
+    return df, keys[df.index]
+
+
+def read_journal(path):
+    """How many leads with each key have been handled and are still in the log"""
+    handled = Counter()
+    if not os.path.exists(path):
+        return handled
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            key, outcome = line.rstrip("\n").split("\t", 1)
+            handled[key] += -1 if outcome == "removed" else 1
+    return handled
+
+
+class Replay:
+    """Deliver leads from a shared iterator on a pool of threads under one rate limit"""
+
+    def __init__(self, args, work, journal):
+        self.args = args
+        self.work = iter(work)
+        self.journal = journal
+        self.lock = threading.Lock()
+        self.stop = threading.Event()
+        self.bucket = TokenBucket(args.rate / 60, max(1, args.concurrency))
+        self.outcomes = Counter()
+        self.errors = Counter()
+        # Delivered rows still to be taken out of failed_leads.csv, as (key, fingerprint)
+        self.remove_failed = args.log == "failed" and not args.dry_run
+        self.delivered = []
+        self.removed_at = time.monotonic()
+
+    def next_item(self):
+        with self.lock:
+            return next(self.work, None)
+
+    def acquire(self):
+        """Block until the rate limit allows another delivery"""
+        while not self.stop.is_set():
+            with self.lock:
+                self.bucket.refill()
+                if self.bucket.tokens >= 1:
+                    self.bucket.tokens -= 1
+                    return True
+                wait = (1 - self.bucket.tokens) / self.bucket.rate
+            time.sleep(min(wait, 0.5))
+        return False
+
+    def record(self, key, fingerprint, outcome, detail=""):
+        with self.lock:
+            self.outcomes[outcome] += 1
+            if detail:
+                self.errors[detail[:120]] += 1
+            if not self.args.dry_run:
+                self.journal.write(f"{key}\t{outcome}\n")
+                self.journal.flush()
+            if self.remove_failed and outcome == "delivered":
+                self.delivered.append((key, fingerprint))
+            due = (len(self.delivered) >= REMOVE_BATCH_SIZE
+                   or time.monotonic() - self.removed_at >= REMOVE_BATCH_SECONDS)
+        if due:
+            self.remove_delivered()
+
+    def remove_delivered(self):
+        """Take the leads delivered so far out of failed_leads.csv"""
+        with self.lock:
+            batch, self.delivered = self.delivered, []
+            self.removed_at = time.monotonic()
+        if batch:
+            remove_failed_leads(fingerprint for _, fingerprint in batch)
+            with self.lock:
+                self.journal.writelines(f"{key}\tremoved\n" for key, _ in batch)
+                self.journal.flush()
+
+    def deliver(self, key, fingerprint, lead_data, targets):
+        lead_data, errors = validate_lead(lead_data)
+        if errors:
+            self.record(key, fingerprint, "invalid", "; ".join(errors))
+            return
+        if self.args.dry_run:
+            self.record(key, fingerprint, "valid")
+            return
+        if not self.acquire():
+            return
+
+        # Failed leads are already in failed_leads.csv; don't add them twice
+        results = deliver_lead(lead_data, targets, log_failed=self.args.log != "failed")
+        status, response = delivery_outcome(results)
+        if 200 <= status < 300:
+            self.record(key, fingerprint, "delivered")
+        else:
+            self.record(key, fingerprint, "failed", f"{status}: {response}")
+
+    def worker(self):
+        while not self.stop.is_set():
+            item = self.next_item()
+            if item is None:
+                return
+            self.deliver(*item)
+
+    def run(self):
+        threads = [threading.Thread(target=self.worker, daemon=True) for _ in range(max(1, self.args.concurrency))]
+        for thread in threads:
+            thread.start()
+        try:
+            while any(thread.is_alive() for thread in threads):
+                for thread in threads:
+                    thread.join(0.2)
+        except KeyboardInterrupt:
+            print("\nStopping after in-flight leads finish; run the same command again to resume.")
+            self.stop.set()
+            for thread in threads:
+                thread.join()
+        finally:
+            self.remove_delivered()
+
+
+def main():
+    args = parse_args()
+    checkpoint = args.checkpoint or f".replay_{args.log}.journal"
+    if args.restart and os.path.exists(checkpoint):
+        os.remove(checkpoint)
+
+    df, fingerprints = load_rows(args)
+    done = Counter() if args.dry_run else read_journal(checkpoint)
+    seen = Counter()
+    work = []
+    skipped = 0
+    for key, fingerprint, (_, row) in zip(lead_keys(args.log, df), fingerprints, df.iterrows()):
+        # Leads with the same key are handled in log order, so the first ones
+        # still in the log are the ones already done
+        seen[key] += 1
+        if seen[key] <= done[key]:
+            skipped += 1
+            continue
+        if args.limit and len(work) >= args.limit:
+            break
+        # Failed rows go back to the org that rejected them; the rest are routed afresh
+        targets = failed_row_targets(row) if args.log == "failed" else None
+        work.append((key, fingerprint, lead_from_log_row(args.log, row), targets))
+
+    print(f"{len(df)} matching leads in {LEAD_LOGS[args.log]}, {skipped} already replayed, {len(work)} to go")
+
+    started = time.monotonic()
+    with open(os.devnull if args.dry_run else checkpoint, "a", encoding="utf-8") as journal:
+        replay = Replay(args, work, journal)
+        replay.run()
+    elapsed = time.monotonic() - started
+
+    handled = sum(replay.outcomes.values())
+    print(f"\nHandled {handled} leads in {elapsed:.1f}s ({handled / elapsed if elapsed else 0:.1f}/s)")
+    for outcome, count in replay.outcomes.most_common():
+        print(f"  {outcome}: {count}")
+    if replay.errors:
+        print("Most common errors:")
+        for error, count in replay.errors.most_common(10):
+            print(f"  {count} x {error}")
+    if handled < len(work):
+        print(f"{len(work) - handled} leads left; run the same command again to resume.")
+    return 1 if replay.outcomes["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,36 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as lead_app
+
+
+@pytest.fixture
+def logs_dir(tmp_path, monkeypatch):
+    """Run with the lead logs (and every other relative path) in an empty directory"""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def client(logs_dir):
+    lead_app.app.config["TESTING"] = True
+    return lead_app.app.test_client()
+
+
+@pytest.fixture
+def salesforce(monkeypatch):
+    """Accept every lead sent to the default org and keep the payloads"""
+    org = lead_app.salesforce_orgs["default"]
+    sent = []
+
+    def send(token, lead_data):
+        sent.append(lead_data)
+        return 201, '{"success": true}'
+
+    monkeypatch.setattr(org, "get_token", lambda stale=None: {"access_token": "test", "instance_url": ""})
+    monkeypatch.setattr(org, "send", send)
+    return sent
@@ -0,0 +1,55 @@
+import threading
+import time
+
+import app as lead_app
+
+
+def call_in_thread(view, results):
+    def run():
+        with lead_app.app.test_request_context("/"):
+            response = view()
+            results.append(getattr(response, "status_code", 200))
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert condition()
+
+
+def test_waiters_past_max_are_rejected_at_once():
+    gate = lead_app.ConcurrencyGate(1, timeout=5, max_waiting=1)
+    release = threading.Event()
+
+    @gate
+    def slow_view():
+        release.wait(5)
+        return "done"
+
+    results = []
+    running = call_in_thread(slow_view, results)
+    wait_for(lambda: gate.state()["running"] == 1)
+    waiting = call_in_thread(slow_view, results)
+    wait_for(lambda: gate.state()["waiting"] == 1)
+
+    started = time.monotonic()
+    with lead_app.app.test_request_context("/"):
+        rejected = slow_view()
+    assert time.monotonic() - started < 1
+    assert rejected.status_code == 503
+    assert rejected.headers["Retry-After"] == "5"
+
+    release.set()
+    running.join()
+    waiting.join()
+    assert results == [200, 200]
+    assert gate.state()["rejected"] == 1
+
+
+def test_default_caps_leave_threads_for_ingestion():
+    held = (lead_app.LIVE_STREAM_LIMIT + lead_app.admin_gate.limit + lead_app.admin_gate.max_waiting)
+    assert held <= lead_app.GUNICORN_THREADS - lead_app.INGEST_RESERVED_THREADS
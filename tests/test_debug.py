@@ -0,0 +1,17 @@
+import app as lead_app
+
+
+def test_non_ascii_token_is_rejected_not_an_error(client, monkeypatch):
+    monkeypatch.setattr(lead_app, "DEBUG_TOKEN", "secret")
+
+    response = client.get("/healthz", headers={"X-Debug-Profile": "1", "X-Debug-Token": "sécret"})
+    assert response.status_code == 200
+    assert "X-Profile-Id" not in response.headers
+
+
+def test_token_is_only_accepted_in_the_header(client, monkeypatch):
+    monkeypatch.setattr(lead_app, "DEBUG_TOKEN", "secret")
+
+    assert "X-Profile-Id" not in client.get("/healthz?token=secret", headers={"X-Debug-Profile": "1"}).headers
+    profiled = client.get("/healthz", headers={"X-Debug-Profile": "1", "X-Debug-Token": "secret"})
+    assert "X-Profile-Id" in profiled.headers
@@ -0,0 +1,91 @@
+import json
+import os
+
+import pytest
+
+import app as lead_app
+
+
+def queued_lead(first):
+    return lead_app.new_lead(first, "Al-Qahtani", "0501234567", f"{first.lower()}@example.com",
+                             "TikTok", "PET-Q2-2025")
+
+
+@pytest.fixture
+def queue(logs_dir, monkeypatch):
+    queue = lead_app.DeferredLeadQueue("deferred_leads.jsonl")
+    # Drain by hand instead of on the background thread
+    monkeypatch.setattr(queue, "start", lambda: None)
+    return queue
+
+
+@pytest.fixture
+def budget(monkeypatch):
+    """Admit only as many leads as the test puts in the list"""
+    allowance = [0]
+
+    def try_admit(lead_data, targets=None):
+        if allowance[0] <= 0:
+            return False
+        allowance[0] -= 1
+        return True
+
+    monkeypatch.setattr(lead_app.admission, "try_admit", try_admit)
+    return allowance
+
+
+def test_drain_resumes_where_it_stopped(queue, budget, salesforce):
+    for first in ("Sara", "Omar", "Reem"):
+        queue.push(queued_lead(first))
+
+    budget[0] = 2
+    queue.drain()
+    assert [lead["Firstname"] for lead in salesforce] == ["Sara", "Omar"]
+    assert queue.depth() == 1
+
+    # A restarted worker carries on from the cursor on disk
+    restarted = lead_app.DeferredLeadQueue("deferred_leads.jsonl")
+    budget[0] = 5
+    restarted.drain()
+    assert [lead["Firstname"] for lead in salesforce] == ["Sara", "Omar", "Reem"]
+
+
+def test_queue_is_compacted_once_empty(queue, budget, salesforce):
+    queue.push(queued_lead("Sara"))
+    budget[0] = 1
+    queue.drain()
+
+    assert not os.path.exists("deferred_leads.jsonl")
+    assert not os.path.exists("deferred_leads.jsonl.cursor")
+    assert queue.depth() == 0
+
+    queue.push(queued_lead("Omar"))
+    assert queue.depth() == 1
+
+
+def test_partial_line_waits_for_the_writer(queue, budget, salesforce):
+    queue.push(queued_lead("Sara"))
+    with open("deferred_leads.jsonl", "a", encoding="utf-8") as f:
+        f.write(json.dumps(queued_lead("Omar"))[:20])
+
+    budget[0] = 5
+    queue.drain()
+
+    assert [lead["Firstname"] for lead in salesforce] == ["Sara"]
+    assert os.path.exists("deferred_leads.jsonl")
+
+
+def test_unreadable_lines_are_dead_lettered(queue, budget, salesforce):
+    queue.push(queued_lead("Sara"))
+    with open("deferred_leads.jsonl", "a", encoding="utf-8") as f:
+        f.write('{"Firstname": "Om\n')
+        f.write('["not", "a", "lead"]\n')
+    queue.push(queued_lead("Reem"))
+
+    budget[0] = 5
+    queue.drain()
+
+    assert [lead["Firstname"] for lead in salesforce] == ["Sara", "Reem"]
+    with open("deferred_leads.jsonl.dead", encoding="utf-8") as f:
+        assert f.read() == '{"Firstname": "Om\n["not", "a", "lead"]\n'
+    assert not os.path.exists("deferred_leads.jsonl")
@@ -0,0 +1,70 @@
+import gzip
+import os
+
+import app as lead_app
+
+
+def write_leads(count):
+    with open("leads.csv", "w", newline="", encoding="utf-8") as f:
+        f.write(",".join(lead_app.LEADS_HEADER) + "\n")
+        for i in range(count):
+            f.write(",".join(f"value {i}" for _ in lead_app.LEADS_HEADER) + "\n")
+    lead_app.note_log_write("leads")
+    with open("leads.csv", "rb") as f:
+        return f.read()
+
+
+def test_gzip_download_resumes_with_range_and_if_range(client):
+    original = write_leads(200)
+
+    full = client.get("/download-log", headers={"Accept-Encoding": "gzip"})
+    assert full.status_code == 200
+    assert full.headers["Content-Encoding"] == "gzip"
+    body = full.get_data()
+    assert gzip.decompress(body) == original
+    etag = full.headers["ETag"]
+
+    part = client.get("/download-log", headers={
+        "Accept-Encoding": "gzip", "Range": "bytes=10-", "If-Range": etag})
+    assert part.status_code == 206
+    assert part.headers["Content-Range"] == f"bytes 10-{len(body) - 1}/{len(body)}"
+    assert part.get_data() == body[10:]
+
+    # Once the log changes the old ETag no longer matches, so the whole new copy comes back
+    changed = write_leads(201)
+    stale = client.get("/download-log", headers={
+        "Accept-Encoding": "gzip", "Range": "bytes=10-", "If-Range": etag})
+    assert stale.status_code == 200
+    assert gzip.decompress(stale.get_data()) == changed
+    assert stale.headers["ETag"] != etag
+
+
+def test_identity_download_supports_ranges(client):
+    original = write_leads(50)
+
+    part = client.get("/download-log", headers={"Accept-Encoding": "identity", "Range": "bytes=0-99"})
+    assert part.status_code == 206
+    assert "Content-Encoding" not in part.headers
+    assert part.get_data() == original[:100]
+
+
+def test_pruning_leaves_other_workers_copies(client):
+    write_leads(20)
+    client.get("/download-log", headers={"Accept-Encoding": "gzip"}).get_data()
+    in_flight = os.path.join(lead_app.DOWNLOAD_CACHE_DIR, "leads-old.gzip.1-2.tmp")
+    with open(in_flight, "wb") as f:
+        f.write(b"partial")
+
+    # An artifact handed out for the old version stays readable after the prune
+    with open("leads.csv", "rb") as source:
+        stat = os.fstat(source.fileno())
+        sending = lead_app.compressed_log_artifact(
+            source, "leads", lead_app.stat_fingerprint(stat), stat.st_size, "gzip")
+    write_leads(21)
+    client.get("/download-log", headers={"Accept-Encoding": "gzip"}).get_data()
+
+    assert os.path.exists(in_flight)
+    names = os.listdir(lead_app.DOWNLOAD_CACHE_DIR)
+    assert len([name for name in names if not name.endswith(".tmp")]) == 1
+    with sending:
+        assert gzip.decompress(sending.read()).count(b"\n") == 21
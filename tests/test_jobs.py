@@ -0,0 +1,96 @@
+import csv
+import json
+import time
+
+import pandas as pd
+
+import app as lead_app
+
+
+def test_commits_are_spaced_by_their_cost(logs_dir):
+    job = lead_app.BackgroundJob("test", 10)
+    job.record(True)
+    assert not job.commit_due()
+
+    job.last_commit -= job.COMMIT_SECONDS
+    assert job.commit_due()
+    job.commit_started -= 4
+    job.checkpoint()
+    assert job.commit_cost >= 4
+
+    # The next commit waits for ten times the last one's cost
+    job.record(True)
+    job.last_commit -= job.COMMIT_SECONDS
+    assert not job.commit_due()
+    job.last_commit -= 40
+    assert job.commit_due()
+
+
+def test_commit_every_bounds_unsaved_results(logs_dir):
+    job = lead_app.BackgroundJob("test", 2000)
+    for _ in range(job.COMMIT_EVERY):
+        job.record(True)
+    assert job.commit_due()
+
+
+def test_bulk_send_waits_for_admission(logs_dir, salesforce, monkeypatch):
+    with open("google_leads.csv", "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Timestamp", "FirstName", "LastName", "Email", "Phone", "CampaignID", "CampaignName",
+                         "AdGroupID", "AdGroupName", "SentToSalesforce", "SalesforceStatus", "LastSentTimestamp"])
+        writer.writerow(["2025-05-10 17:33:31", "Sara", "Al-Qahtani", "sara@example.com", "0501234567",
+                         "20001", "PET-Q2-2025", "30001", "AdGroup 1", "False", "", ""])
+
+    answers = [False, False, True]
+    attempts = []
+
+    def try_admit(lead_data, targets=None):
+        attempts.append((lead_data["Firstname"], [target.label for target in targets]))
+        return answers.pop(0)
+
+    monkeypatch.setattr(lead_app.admission, "try_admit", try_admit)
+    monkeypatch.setattr(lead_app, "ADMISSION_POLL_SECONDS", 0)
+
+    job = lead_app.BackgroundJob("google-send", 1)
+    lead = lead_app.lead_from_log_row("google", pd.read_csv("google_leads.csv", dtype=str).iloc[0])
+    lead_app.run_google_send(job, [(0, lead)], mark_sent=True, log_results=False)
+
+    assert attempts == [("Sara", ["default"])] * 3
+    assert len(salesforce) == 1
+    row = pd.read_csv("google_leads.csv", dtype=str).iloc[0]
+    assert row["SentToSalesforce"] == "True"
+    assert row["SalesforceStatus"] == "201"
+
+
+def test_waiting_job_keeps_reporting_progress(logs_dir, monkeypatch):
+    answers = [False, False, True]
+    beats = []
+    monkeypatch.setattr(lead_app.admission, "try_admit", lambda lead_data, targets=None: answers.pop(0))
+    monkeypatch.setattr(lead_app, "ADMISSION_POLL_SECONDS", 0.01)
+
+    lead_app.admission.admit({}, [], heartbeat=lambda: beats.append(time.monotonic()), heartbeat_interval=0)
+
+    assert answers == []
+    assert len(beats) == 2
+
+
+def test_heartbeat_keeps_a_slow_committing_job_alive(logs_dir):
+    job = lead_app.BackgroundJob("test", 10)
+    job.save()
+    job.record(True)
+
+    # Nothing committed for longer than the stall threshold, but the job kept working
+    saved_path = f"{lead_app.JOBS_DIR}/{job.id}.json"
+    with open(saved_path) as f:
+        saved = json.load(f)
+    saved["alive"] -= lead_app.JOB_STALL_SECONDS + 1
+    with open(saved_path, "w") as f:
+        json.dump(saved, f)
+    assert lead_app.load_job(job.id)["status"] == "stalled"
+
+    job.last_save -= job.HEARTBEAT_SECONDS
+    job.record(True)
+    state = lead_app.load_job(job.id)
+    assert state["status"] == "running"
+    # Only committed results are reported
+    assert state["done"] == 0
@@ -0,0 +1,15 @@
+import app as lead_app
+
+
+def test_streams_leave_threads_for_ingestion():
+    assert lead_app.LIVE_STREAM_LIMIT <= lead_app.GUNICORN_THREADS - lead_app.INGEST_RESERVED_THREADS
+    assert lead_app.live_events.max_subscribers == lead_app.LIVE_STREAM_LIMIT
+
+
+def test_stream_refused_past_the_limit(client, monkeypatch):
+    monkeypatch.setattr(lead_app.live_events, "max_subscribers", 0)
+
+    response = client.get("/api/stream")
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "30"
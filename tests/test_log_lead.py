@@ -0,0 +1,74 @@
+import csv
+
+import app as lead_app
+
+
+def read_rows(path="leads.csv"):
+    with open(path, newline="", encoding="utf-8") as f:
+        return list(csv.DictReader(f))
+
+
+def sample_lead():
+    return lead_app.new_lead("Sara", "Al-Qahtani", "0501234567", "sara@example.com",
+                             "TikTok", "PET-Q2-2025", "1-3 months")
+
+
+def test_new_log_gets_standard_header(logs_dir):
+    lead_app.log_lead(sample_lead(), 201)
+
+    with open("leads.csv", encoding="utf-8") as f:
+        assert f.readline().strip().split(",") == lead_app.LEADS_HEADER
+    row = read_rows()[0]
+    assert row["Status"] == "201"
+    assert row["Campaign_Source"] == "TikTok"
+    assert row["Market"] == "Saudi Arabia"
+    assert row["Enquiry_Type"] == "Book_a_Test_Drive"
+    assert row["Purchase_TimeFrame"] == "1-3 months"
+
+
+def test_values_follow_existing_header(logs_dir):
+    header = ["Timestamp", "Status", "Error", "Campaign_Source", "Mobile", "Firstname", "Enquiry_Type"]
+    with open("leads.csv", "w", newline="", encoding="utf-8") as f:
+        csv.writer(f).writerow(header)
+
+    lead_app.log_lead(sample_lead())
+
+    with open("leads.csv", encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    assert lines[0].split(",") == header
+    row = read_rows()[0]
+    assert row["Campaign_Source"] == "TikTok"
+    assert row["Mobile"] == "0501234567"
+    assert row["Firstname"] == "Sara"
+
+
+def test_rollups_and_search_read_the_right_columns(logs_dir):
+    for _ in range(3):
+        lead_app.log_lead(sample_lead())
+
+    rows = lead_app.query_rollups(["leads"], group=["source"])
+    assert [(row["source"], row["count"]) for row in rows] == [("TikTok", 3)]
+    assert lead_app.search_leads("leads", "qahtani") == [0, 1, 2]
+    assert lead_app.search_leads("leads", "book_a_test") == []
+
+
+def test_logging_leaves_the_rollup_to_catch_up_on_read(logs_dir, monkeypatch):
+    rollup = lead_app.rollups["leads"]
+    refresh = rollup.refresh
+    refreshes = []
+    monkeypatch.setattr(rollup, "refresh", lambda: refreshes.append(1) or refresh())
+
+    lead_app.log_lead(sample_lead())
+    assert refreshes == []
+
+    rows = lead_app.query_rollups(["leads"], group=["source"])
+    assert [(row["source"], row["count"]) for row in rows] == [("TikTok", 1)]
+    assert refreshes == [1]
+
+
+def test_logged_row_replays_as_the_sent_payload(logs_dir):
+    lead = sample_lead()
+    lead_app.log_lead(lead)
+
+    replayed = lead_app.lead_from_log_row("leads", read_rows()[0])
+    assert replayed == lead
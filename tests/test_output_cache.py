@@ -0,0 +1,37 @@
+import csv
+
+import app as lead_app
+
+
+def write_google_leads(rows):
+    with open("google_leads.csv", "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Timestamp", "FirstName", "LastName", "Email", "Phone", "CampaignID", "CampaignName",
+                         "AdGroupID", "AdGroupName", "SentToSalesforce", "SalesforceStatus", "LastSentTimestamp"])
+        writer.writerows(rows)
+    lead_app.note_log_write("google")
+
+
+def google_row(first):
+    return ["2025-05-10 17:33:31", first, "Al-Qahtani", "lead@example.com", "0501234567",
+            "20001", "PET-Q2-2025", "30001", "AdGroup 1", "False", "", ""]
+
+
+def test_query_values_are_not_normalised(client):
+    write_google_leads([google_row("Sara"), google_row("Omar")])
+
+    first = client.get("/google-leads?search=sara")
+    assert first.headers["X-Output-Cache"] == "miss"
+    assert client.get("/google-leads?search=sara").headers["X-Output-Cache"] == "hit"
+
+    padded = client.get("/google-leads?search=sara%20")
+    assert padded.headers["X-Output-Cache"] == "miss"
+    assert padded.get_data() != first.get_data()
+
+
+def test_bad_page_is_not_served_from_cache(client, monkeypatch):
+    monkeypatch.setitem(lead_app.app.config, "PROPAGATE_EXCEPTIONS", False)
+    write_google_leads([google_row("Sara")])
+
+    assert client.get("/google-leads").status_code == 200
+    assert client.get("/google-leads?page=%20").status_code == 500
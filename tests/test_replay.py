@@ -0,0 +1,99 @@
+import csv
+import sys
+
+import pandas as pd
+
+import app as lead_app
+import replay
+
+FAILED_HEADER = ["Timestamp", "Error", "Status", "Response", "Firstname", "Lastname",
+                 "Mobile", "Email", "Campaign_Source", "Campaign_Name"]
+
+
+def write_failed(rows):
+    with open("failed_leads.csv", "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(FAILED_HEADER)
+        writer.writerows(rows)
+
+
+def failed_row(first, mobile, source="TikTok"):
+    return ["2025-05-10 17:33:31", "API Error", "503", "Service Unavailable", first, "Al-Qahtani",
+            mobile, f"{first.lower()}@example.com", source, "PET-Q2-2025"]
+
+
+def run_replay(monkeypatch, *args, log="failed", restart=True):
+    argv = ["replay.py", log, "--rate", "6000", *args]
+    if restart:
+        argv.append("--restart")
+    monkeypatch.setattr(sys, "argv", argv)
+    return replay.main()
+
+
+def test_replayed_failed_leads_are_removed(logs_dir, salesforce, monkeypatch):
+    write_failed([
+        failed_row("Sara", "0501234567"),
+        failed_row("Omar", "12345"),
+        failed_row("Reem", "0507654321", source="Snapchat"),
+    ])
+
+    assert run_replay(monkeypatch) == 0
+
+    # The invalid mobile is never sent and stays for someone to fix
+    assert sorted(lead["Firstname"] for lead in salesforce) == ["Reem", "Sara"]
+    assert pd.read_csv("failed_leads.csv", dtype=str)["Firstname"].tolist() == ["Omar"]
+
+
+def test_filtered_replay_removes_only_its_rows(logs_dir, salesforce, monkeypatch):
+    write_failed([
+        failed_row("Sara", "0501234567"),
+        failed_row("Sara", "0501234567"),
+        failed_row("Reem", "0507654321", source="Snapchat"),
+    ])
+
+    run_replay(monkeypatch, "--source", "Snapchat")
+
+    assert [lead["Firstname"] for lead in salesforce] == ["Reem"]
+    assert pd.read_csv("failed_leads.csv", dtype=str)["Firstname"].tolist() == ["Sara", "Sara"]
+
+
+def test_dry_run_leaves_the_log_alone(logs_dir, salesforce, monkeypatch):
+    write_failed([failed_row("Sara", "0501234567")])
+
+    run_replay(monkeypatch, "--dry-run")
+
+    assert salesforce == []
+    assert len(pd.read_csv("failed_leads.csv", dtype=str)) == 1
+
+
+def test_resumed_failed_replay_sends_identical_leads_left_in_the_log(logs_dir, salesforce, monkeypatch):
+    write_failed([failed_row("Sara", "0501234567"), failed_row("Sara", "0501234567")])
+
+    run_replay(monkeypatch, "--limit", "1")
+    assert len(pd.read_csv("failed_leads.csv", dtype=str)) == 1
+
+    # The delivered twin is gone from the log, so the one left is still to do
+    run_replay(monkeypatch, restart=False)
+    assert len(salesforce) == 2
+    assert len(pd.read_csv("failed_leads.csv", dtype=str)) == 0
+
+
+def test_resumed_google_replay_ignores_status_rewrites(logs_dir, salesforce, monkeypatch):
+    with open("google_leads.csv", "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Timestamp", "FirstName", "LastName", "Email", "Phone", "CampaignID", "CampaignName",
+                         "AdGroupID", "AdGroupName", "SentToSalesforce", "SalesforceStatus", "LastSentTimestamp"])
+        for first, phone in [("Sara", "0501234567"), ("Reem", "0507654321")]:
+            writer.writerow(["2025-05-10 17:33:31", first, "Al-Qahtani", f"{first.lower()}@example.com", phone,
+                             "20001", "PET-Q2-2025", "30001", "AdGroup 1", "False", "", ""])
+
+    run_replay(monkeypatch, "--limit", "1", log="google")
+    assert [lead["Firstname"] for lead in salesforce] == ["Sara"]
+
+    # A bulk send from the dashboard marks the lead as sent in between
+    df = pd.read_csv("google_leads.csv", dtype=str, keep_default_na=False)
+    df.loc[0, ["SentToSalesforce", "SalesforceStatus"]] = ["True", "201"]
+    df.to_csv("google_leads.csv", index=False)
+
+    run_replay(monkeypatch, log="google", restart=False)
+    assert [lead["Firstname"] for lead in salesforce] == ["Sara", "Reem"]
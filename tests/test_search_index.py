@@ -0,0 +1,107 @@
+import csv
+
+import pandas as pd
+import pytest
+
+import app as lead_app
+
+FIELDS = ["Firstname", "Lastname", "Email", "Mobile"]
+HEADER = ["Timestamp", "Firstname", "Lastname", "Email", "Mobile", "Campaign_Source"]
+
+
+def write_rows(path, rows, mode="a"):
+    with open(path, mode, newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        if mode == "w":
+            writer.writerow(HEADER)
+        writer.writerows(rows)
+
+
+def lead_row(i, first="Sara", last="Al-Qahtani"):
+    return ["2025-05-10 17:33:31", first, last, f"lead{i}@example.com", f"05{i:08d}", "TikTok"]
+
+
+@pytest.fixture
+def index(logs_dir):
+    return lead_app.LeadSearchIndex("leads.csv", FIELDS)
+
+
+def matches_pandas(path, query):
+    df = pd.read_csv(path, dtype=str, keep_default_na=False)
+    text = df[FIELDS].apply(lambda row: "\0".join(row).lower(), axis=1)
+    return df.index[text.str.contains(query.lower(), regex=False)].tolist()
+
+
+def test_row_ids_match_pandas_index(index):
+    rows = [lead_row(i) for i in range(20)]
+    rows[3] = lead_row(3, "محمد", "القحطاني")
+    rows[7] = lead_row(7, "Omar, Jr.", 'Al-"Harbi"')
+    rows[12] = lead_row(12, "Fahad", "Multi\nLine")
+    write_rows("leads.csv", rows, mode="w")
+
+    for query in ["qahtani", "القحطاني", "omar, jr", '"harbi"', "fahad", "00000007", "05", "x"]:
+        assert index.search(query) == matches_pandas("leads.csv", query), query
+
+
+def test_appended_and_rewritten_logs(index):
+    write_rows("leads.csv", [lead_row(i) for i in range(5)], mode="w")
+    assert index.search("lead4@") == [4]
+
+    write_rows("leads.csv", [lead_row(i, "Reem") for i in range(5, 8)])
+    assert index.search("reem") == [5, 6, 7]
+
+    # A rewrite that drops rows starts the row ids over
+    write_rows("leads.csv", [lead_row(i, "Reem") for i in range(6, 8)], mode="w")
+    assert index.search("reem") == [0, 1]
+    assert index.search("lead4@") == []
+
+
+def test_catching_up_in_small_batches(index, monkeypatch):
+    monkeypatch.setattr(lead_app, "LOG_READ_BYTES", 100)
+    rows = [lead_row(i) for i in range(50)]
+    rows[20] = lead_row(20, "Noura" * 100)
+    write_rows("leads.csv", rows, mode="w")
+
+    assert index.search("noura") == [20]
+    assert index.search("lead49@") == [49]
+    assert len(index) == 50
+
+
+def test_short_queries_do_not_match_across_rows(index):
+    write_rows("leads.csv", [lead_row(0, "Ab", "C"), lead_row(1, "D", "Ef")], mode="w")
+    # Row 0's text ends with its mobile and row 1's starts with "d"
+    assert index.search("0d") == []
+    assert index.search("ab") == [0]
+    assert index.search("") == [0, 1]
+
+
+def test_quoted_newlines_across_batches(logs_dir, monkeypatch):
+    monkeypatch.setattr(lead_app, "LOG_READ_BYTES", 700)
+    response = '<html>\n<body>\n"Service" Unavailable\n</body>\n</html>'
+    with open("failed_leads.csv", "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Timestamp", "Error", "Status", "Response", "Firstname", "Lastname",
+                         "Mobile", "Email", "Campaign_Source", "Campaign_Name"])
+        for i in range(50):
+            writer.writerow(["2025-05-10 17:33:31", "API Error", "503", response, f"First{i}", "Al-Qahtani",
+                             f"05{i:08d}", f"lead{i}@example.com", "TikTok", "PET-Q2-2025"])
+
+    index = lead_app.LeadSearchIndex("failed_leads.csv", FIELDS)
+    assert len(index) == 0
+    assert index.search("first49") == [49]
+    assert len(index) == 50
+
+    rollup = lead_app.LeadRollup("failed_leads.csv", "Campaign_Source", "Campaign_Name", "failed")
+    assert [(key[1], count) for key, count in rollup.items()] == [("TikTok", 50)]
+
+
+def test_row_being_written_waits_for_its_closing_quote(index):
+    write_rows("leads.csv", [lead_row(0)], mode="w")
+    with open("leads.csv", "a", encoding="utf-8") as f:
+        f.write('2025-05-10 17:33:31,"Sara\n')
+    assert index.search("lead0@") == [0]
+    assert len(index) == 1
+
+    with open("leads.csv", "a", encoding="utf-8") as f:
+        f.write('Multi",Al-Qahtani,lead1@example.com,0500000001,TikTok\n')
+    assert index.search("lead1@") == [1]
@@ -0,0 +1,63 @@
+import pytest
+
+import app as lead_app
+
+
+@pytest.mark.parametrize("value", [
+    "0501234567", "501234567", "966501234567", "+966 50 123 4567", "00966501234567",
+    "٠٥٠١٢٣٤٥٦٧", "۰۵۰۱۲۳۴۵۶۷", "050-123-4567", 501234567,
+])
+def test_saudi_mobiles_are_normalised(value):
+    assert lead_app.normalize_saudi_mobile(value) == "0501234567"
+
+
+@pytest.mark.parametrize("value", ["0401234567", "12345", "05012345678", "+971501234567", ""])
+def test_other_numbers_are_rejected(value):
+    assert lead_app.normalize_saudi_mobile(value) is None
+
+
+def test_valid_lead_is_repaired():
+    lead, errors = lead_app.validate_lead({
+        "Firstname": "  Sara ", "Lastname": "Q" * 100, "Mobile": "+966 50 123 4567",
+        "Email": " Sara@Example.COM ", "Purchase_Time_Frame": "في أقرب وقت (أقل من شهر)", "Ad_Id": 7
+    })
+
+    assert errors == []
+    assert lead["Firstname"] == "Sara"
+    assert lead["Lastname"] == "Q" * 80
+    assert lead["Mobile"] == "0501234567"
+    assert lead["Email"] == "sara@example.com"
+    assert lead["Purchase_Time_Frame"] == "Less than 1 month"
+    assert lead["Ad_Id"] == 7
+
+
+def test_invalid_lead_reports_every_problem():
+    lead = {"Firstname": "", "Mobile": "123", "Email": "not-an-email"}
+    cleaned, errors = lead_app.validate_lead(lead)
+
+    assert errors == [
+        "Missing required field: Firstname",
+        "Missing required field: Lastname",
+        "Mobile is not a valid Saudi mobile number",
+        "Email is not a valid email address",
+    ]
+    assert lead == {"Firstname": "", "Mobile": "123", "Email": "not-an-email"}
+
+
+@pytest.mark.parametrize("payload", [None, [], "lead"])
+def test_non_object_payloads_are_rejected(payload):
+    assert lead_app.validate_lead(payload) == (None, ["Payload must be a JSON object"])
+
+
+def test_non_text_values_are_rejected():
+    _, errors = lead_app.validate_lead({"Firstname": ["Sara"], "Lastname": "Q", "Mobile": True,
+                                        "Email": "sara@example.com"})
+    assert errors == ["Firstname must be text, got list", "Mobile must be text, got bool"]
+
+
+def test_null_optional_fields_are_dropped():
+    lead, errors = lead_app.validate_lead({"Firstname": "Sara", "Lastname": "Q", "Mobile": "0501234567",
+                                           "Email": "sara@example.com", "Campaign_Source": None, "Ad_Id": None})
+    assert errors == []
+    assert "Campaign_Source" not in lead
+    assert lead["Ad_Id"] is None
@@ -0,0 +1,111 @@
+import os
+
+import pandas as pd
+
+import app as lead_app
+
+
+def webhook_lead(**extra):
+    lead = {
+        "Firstname": "Sara", "Lastname": "Al-Qahtani", "Mobile": "0501234567",
+        "Email": "sara@example.com", "Campaign_Source": "TikTok", "Campaign_Name": "PET-Q2-2025"
+    }
+    lead.update(extra)
+    return lead
+
+
+def test_unknown_fields_are_sent_but_not_logged(client, salesforce):
+    assert client.post("/webhook", json=webhook_lead()).status_code == 200
+    assert client.post("/webhook", json=webhook_lead(Ad_Id="123456")).status_code == 200
+
+    assert salesforce[1]["Ad_Id"] == "123456"
+    df = pd.read_csv("leads.csv", dtype=str)
+    assert list(df.columns) == lead_app.LEADS_HEADER
+    assert len(df) == 2
+    assert df["Campaign_Source"].tolist() == ["TikTok", "TikTok"]
+
+
+def test_profile_fields_outside_the_header_are_not_logged(logs_dir, salesforce):
+    org = lead_app.salesforce_orgs["default"]
+    target = lead_app.DeliveryTarget(org, "riyadh", {"DealerCode": "RYD", "Dealer_Region": "Central"})
+    lead = lead_app.new_lead("Sara", "Al-Qahtani", "0501234567", "sara@example.com", "TikTok", "PET-Q2-2025")
+
+    lead_app.deliver_lead(lead, [target])
+    lead_app.deliver_lead(lead)
+
+    assert salesforce[0]["Dealer_Region"] == "Central"
+    df = pd.read_csv("leads.csv", dtype=str)
+    assert list(df.columns) == lead_app.LEADS_HEADER
+    assert df["DealerCode"].tolist() == ["RYD", "PTC"]
+
+
+def google_lead(**extra):
+    lead = {
+        "firstName": "Sara", "lastName": "Al-Qahtani", "email": "sara@example.com", "phone": "+966501234567",
+        "campaignId": "20001", "campaignName": "PET-Q2-2025", "adGroupId": "30001", "adGroupName": "AdGroup 1"
+    }
+    lead.update(extra)
+    return lead
+
+
+def test_null_optional_fields_are_treated_as_missing(client, salesforce):
+    response = client.post("/webhook", json=webhook_lead(Campaign_Source=None, Campaign_Name=None))
+
+    assert response.status_code == 200
+    assert salesforce[0]["Campaign_Source"] == ""
+    assert salesforce[0]["Source_Site"] == ""
+    assert pd.read_csv("leads.csv", dtype=str, keep_default_na=False)["Campaign_Source"].tolist() == [""]
+
+
+def test_invalid_webhook_lead_is_kept_for_retry(client, salesforce):
+    response = client.post("/webhook", json=webhook_lead(Mobile="+971501234567"))
+
+    assert response.status_code == 400
+    assert salesforce == []
+    assert not os.path.exists("leads.csv")
+    row = pd.read_csv("failed_leads.csv", dtype=str).iloc[0]
+    assert row["Error"] == "Validation Error"
+    assert row["Status"] == "400"
+    assert row["Response"] == "Mobile is not a valid Saudi mobile number"
+    assert row["Mobile"] == "+971501234567"
+    assert row["Campaign_Source"] == "TikTok"
+
+
+def test_non_object_payload_is_still_recorded(client, salesforce):
+    assert client.post("/webhook", json=["not", "a", "lead"]).status_code == 400
+
+    row = pd.read_csv("failed_leads.csv", dtype=str, keep_default_na=False).iloc[0]
+    assert row["Error"] == "Validation Error"
+    assert row["Firstname"] == ""
+
+
+def test_invalid_form_lead_is_kept_for_retry(client, salesforce):
+    response = client.post("/form", data={"firstname": "Sara", "lastname": "Al-Qahtani", "mobile": "123",
+                                          "email": "sara@example.com", "source": "Website", "campaign": "Test"})
+
+    assert response.status_code == 400
+    assert salesforce == []
+    row = pd.read_csv("failed_leads.csv", dtype=str).iloc[0]
+    assert row["Error"] == "Validation Error"
+    assert row["Mobile"] == "123"
+
+
+def test_google_lead_is_saved_and_sent(client, salesforce):
+    response = client.post("/webhook/google", json=google_lead())
+
+    assert response.status_code == 200
+    assert salesforce[0]["Mobile"] == "0501234567"
+    row = pd.read_csv("google_leads.csv", dtype=str, keep_default_na=False).iloc[0]
+    assert row["Phone"] == "+966501234567"
+    assert row["SalesforceStatus"] == ""
+
+
+def test_invalid_google_lead_is_saved_and_acknowledged(client, salesforce):
+    response = client.post("/webhook/google", json=google_lead(phone="12345"))
+
+    assert response.status_code == 200
+    assert response.get_json()["errors"] == ["Mobile is not a valid Saudi mobile number"]
+    assert salesforce == []
+    rows = pd.read_csv("google_leads.csv", dtype=str, keep_default_na=False)
+    assert rows["Phone"].tolist() == ["12345"]
+    assert rows["SalesforceStatus"].tolist() == ["Invalid"]